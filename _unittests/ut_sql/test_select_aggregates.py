@@ -0,0 +1,96 @@
+"""
+@brief      test log(time=1s)
+"""
+import unittest
+from pysqllike.generic.iter_rows import IterRow
+from pysqllike.generic.column_type import NA, CFT
+from pysqllike.generic.column_group_operator import OperatorGroupVar, OperatorGroupLast
+
+
+class TestSelectAggregates (unittest.TestCase):
+
+    def _table(self):
+        lr = [{"nom": "j", "age": 10, "gender": "M"},
+              {"nom": "jean", "age": 40, "gender": "M"},
+              {"nom": "jeanne", "age": 2, "gender": "F"},
+              {"nom": "jean", "age": 30, "gender": "M"}]
+        return IterRow(None, lr)
+
+    def test_aggregates(self):
+        tbl = self._table()
+        iter = tbl.groupby(tbl.gender, s=tbl.age.sum(), mi=tbl.age.min(),
+                           ma=tbl.age.max(), fi=tbl.nom.first(),
+                           la=tbl.nom.last(), cd=tbl.nom.count_distinct())
+        res = list(iter)
+        exp = [{'gender': 'F', 's': 2, 'mi': 2, 'ma': 2, 'fi': 'jeanne',
+                'la': 'jeanne', 'cd': 1},
+               {'gender': 'M', 's': 80, 'mi': 10, 'ma': 40, 'fi': 'j',
+                'la': 'jean', 'cd': 2}]
+        if res != exp:
+            raise ValueError(str(res))
+
+    def test_variance(self):
+        tbl = self._table()
+        iter = tbl.groupby(tbl.gender, v=tbl.age.var(), s=tbl.age.std(),
+                           v0=tbl.age.var(unbiased=False))
+        res = list(iter)
+        assert isinstance(res[0]["v"], NA)
+        self.assertEqual(res[0]["v0"], 0.)
+        self.assertAlmostEqual(res[1]["v"], 233.33333333333334)
+        self.assertAlmostEqual(res[1]["s"] ** 2, 233.33333333333334)
+        self.assertAlmostEqual(res[1]["v0"], 155.55555555555554)
+
+        # large offset, the naive formula loses every digit
+        values = [1e9 + 4, 1e9 + 7, 1e9 + 13, 1e9 + 16]
+        op = OperatorGroupVar()
+        self.assertAlmostEqual(op(values), 30.)
+        st1 = op.init()
+        for v in values[:1]:
+            st1 = op.update(st1, v)
+        st2 = op.init()
+        for v in values[1:]:
+            st2 = op.update(st2, v)
+        self.assertAlmostEqual(op.finalize(op.merge(st1, st2)), 30.)
+
+        op = OperatorGroupLast()
+        st = op.merge(op.update(op.init(), 1), op.update(op.init(), 2))
+        self.assertEqual(op.finalize(st), 2)
+
+    def test_aggregates_pipeline(self):
+        tbl = self._table()
+        iter = tbl.groupby(tbl.gender, s=tbl.age.sum(), ma=tbl.age.max(),
+                           cd=tbl.nom.count_distinct())
+        res = list(iter.compile())
+        exp = [{'gender': 'F', 's': 2, 'ma': 2, 'cd': 1},
+               {'gender': 'M', 's': 80, 'ma': 40, 'cd': 2}]
+        if res != exp:
+            raise ValueError(str(res))
+
+    def test_aggregates_shared_input(self):
+        calls = []
+
+        def double(x):
+            calls.append(x)
+            return x * 2
+
+        for mode in ["rows", "compile", "batch"]:
+            del calls[:]
+            tbl = self._table()
+            exp2 = CFT(double, tbl.age)
+            iter = tbl.groupby(tbl.gender, s=exp2.sum(), a=exp2.avg(),
+                               m=CFT(double, tbl.age).max(), n=tbl.nom.len())
+            if mode == "compile":
+                iter = iter.compile()
+            elif mode == "batch":
+                iter = iter.batch()
+            res = list(iter)
+            exp = [{'gender': 'F', 's': 4, 'a': 4.0, 'm': 4, 'n': 1},
+                   {'gender': 'M', 's': 160, 'a': 160 / 3, 'm': 80, 'n': 3}]
+            if res != exp:
+                raise ValueError(str(res))
+            # the shared expression is evaluated once per row
+            self.assertEqual(len(calls), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
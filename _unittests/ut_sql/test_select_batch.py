@@ -0,0 +1,120 @@
+# coding: utf-8
+"""
+@brief      test log(time=1s)
+"""
+import unittest
+from pysqllike.generic.iter_rows import IterRow
+from pysqllike.generic.column_type import CFT, NA
+
+
+class TestSelectBatch (unittest.TestCase):
+
+    def _table(self):
+        lr = [{"nom": "j", "age": 10, "gender": "M"},
+              {"nom": "jean", "age": 40, "gender": "M"},
+              {"nom": "jeanne", "age": 2, "gender": "F"}]
+        return IterRow(None, lr)
+
+    def test_batch_select_where(self):
+        tbl = self._table()
+        iter = tbl.select(tbl.nom, age2=tbl.age * 2, age3=tbl.age // 3 + 1)
+        wher = iter.where((iter.age2 > 5).And(iter.age2 < 50))
+        batches = list(wher.iter_batches(batch_size=2))
+        assert len(batches) == 1
+        if batches[0] != {'nom': ['j'], 'age2': [20], 'age3': [4]}:
+            raise ValueError(str(batches))
+
+        tbl = self._table()
+
+        def myf(x, y):
+            return x * 2.5 + y
+        iter = tbl.select(tbl.nom, age0=CFT(myf, tbl.age, tbl.age))
+        res = list(iter.batch(batch_size=2, as_dict=False))
+        exp = [('j', 35.0), ('jean', 140.0), ('jeanne', 7.0)]
+        if res != exp:
+            raise ValueError(str(res))
+
+    def test_batch_groupby(self):
+        tbl = self._table()
+        iter = tbl.groupby(tbl.gender, len_nom=tbl.nom.len(),
+                           avg_age=tbl.age.avg())
+        res = list(iter.batch(batch_size=1))
+        exp = [{'gender': 'F', 'len_nom': 1, 'avg_age': 2.0},
+               {'gender': 'M', 'len_nom': 2, 'avg_age': 25.0}]
+        if res != exp:
+            raise ValueError(str(res))
+
+    def test_batch_unionall(self):
+        tbl = self._table()
+        tbl2 = IterRow(None, [{"nom": "a", "newage": 3}])
+        iter = tbl.unionall(tbl2, merge_schema=True)
+        res = list(iter.batch(batch_size=2))
+        assert len(res) == 4
+        assert isinstance(res[0]["newage"], NA)
+        assert isinstance(res[3]["age"], NA)
+        assert res[3]["newage"] == 3
+
+    def test_batch_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            return
+        lr = [{"nom": "j", "age": 10, "gender": "M"},
+              {"nom": "jean", "age": 40, "gender": "M"},
+              {"nom": "jeanne", "age": 2, "gender": "F"},
+              {"nom": "jo", "age": 0, "gender": "F"}]
+        tbl = IterRow(None, lr)
+        iter = tbl.select(tbl.nom, tbl.gender, age2=tbl.age * 2 + 1,
+                          age3=tbl.age // 3, age4=tbl.age ** 2)
+        wher = iter.where((iter.age2 > 5).And(iter.age2 < 50))
+        batches = list(wher.iter_batches(batch_size=3, use_numpy=True))
+        assert isinstance(batches[0]["age2"], numpy.ndarray)
+        assert isinstance(batches[0]["nom"], list)
+        res = list(wher.batch(batch_size=3, use_numpy=True))
+        exp = [{'nom': 'j', 'gender': 'M', 'age2': 21, 'age3': 3, 'age4': 100}]
+        if res != exp:
+            raise ValueError(str(res))
+
+        # division by zero falls back to Python and raises an exception
+        tbl = IterRow(None, lr)
+        iter = tbl.select(tbl.nom, ratio=tbl.age / tbl.age)
+        self.assertRaises(ZeroDivisionError,
+                          lambda: list(iter.batch(use_numpy=True)))
+
+        # arithmetic on booleans follows Python
+        def bools():
+            tbl = IterRow([("a", int), ("b", int), ("age", int)],
+                          [{"a": True, "b": True, "age": 4},
+                           {"a": False, "b": True, "age": 6},
+                           {"a": False, "b": False, "age": 2}])
+            return tbl.select(r=tbl.a + tbl.b, d=tbl.a - tbl.b, m=tbl.a * tbl.b,
+                              c=(tbl.age > 3) + (tbl.age > 5),
+                              o=(tbl.age > 3).Or(tbl.a))
+
+        res = list(bools().batch(batch_size=2, use_numpy=True))
+        self.assertEqual(res, list(bools()))
+        self.assertEqual([r["r"] for r in res], [2, 1, 0])
+
+        # large integers fall back to Python instead of overflowing
+        big = [{"a": 2}, {"a": 3}, {"a": 2 ** 40}, {"a": -2 ** 40}]
+        tbl = IterRow(None, big)
+        iter = tbl.select(p=tbl.a ** 70, m=tbl.a * tbl.a, s=tbl.a + 2 ** 62,
+                          d=tbl.a - 2 ** 62, q=tbl.a * 3)
+        res = list(iter.batch(batch_size=2, use_numpy=True))
+        exp = [{"p": r["a"] ** 70, "m": r["a"] * r["a"], "s": r["a"] + 2 ** 62,
+                "d": r["a"] - 2 ** 62, "q": r["a"] * 3} for r in big]
+        self.assertEqual(res, exp)
+        batches = list(tbl.select(q=tbl.a * 3).iter_batches(use_numpy=True))
+        assert isinstance(batches[0]["q"], numpy.ndarray)
+
+        tbl = IterRow(None, lr)
+        iter = tbl.groupby(tbl.gender, avg_age=tbl.age.avg())
+        res = list(iter.batch(batch_size=3, use_numpy=True))
+        exp = [{'gender': 'F', 'avg_age': 1.0},
+               {'gender': 'M', 'avg_age': 25.0}]
+        if res != exp:
+            raise ValueError(str(res))
+
+
+if __name__ == "__main__":
+    unittest.main()
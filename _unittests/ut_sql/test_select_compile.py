@@ -0,0 +1,76 @@
+# coding: utf-8
+"""
+@brief      test log(time=1s)
+"""
+import unittest
+from pysqllike.generic.iter_rows import IterRow, IterException
+from pysqllike.generic.column_type import CFT
+from pysqllike.generic.column_compiler import CompiledColumns
+
+
+class TestSelectCompile (unittest.TestCase):
+
+    def test_compiled_columns(self):
+        lr = [("nom", 10), ("jean", 40)]
+        schema = [("nom", str), ("age", int)]
+        tbl = IterRow(schema, lr)
+
+        comp = CompiledColumns([tbl.nom, (tbl.age * 2 + 1).Or(tbl.age == 3)],
+                               tbl.Schema, condition=tbl.age > 20)
+        code = comp.Source
+        assert "row['age']" in code
+        fct = comp.function(True)
+        assert fct({"nom": "a", "age": 10}) is None
+        res = fct({"nom": "a", "age": 30})
+        if res != {"nom": "a", "__unk__": 61}:
+            raise ValueError(str(res))
+
+        comp = CompiledColumns([tbl.age // 3], tbl.Schema, as_dict=False)
+        fct = comp.function(False)
+        res = fct(("a", 10))
+        if res != (3,):
+            raise ValueError(str(res))
+
+    def test_compiled_function(self):
+        lr = [("nom", 10), ("jean", 40)]
+        schema = [("nom", str), ("age", int)]
+        tbl = IterRow(schema, lr)
+
+        def myf(x, y):
+            return x * 2.5 + y
+        iter = tbl.select(tbl.nom, age0=CFT(myf, tbl.age, tbl.age) + 1)
+        res = list(iter)
+        exp = [{'nom': 'nom', 'age0': 36.0},
+               {'nom': 'jean', 'age0': 141.0}]
+        if res != exp:
+            raise ValueError(str(res))
+
+    def test_compiled_exception(self):
+        lr = [("nom", 10), ("jean", 40)]
+        schema = [("nom", str), ("age", int)]
+        tbl = IterRow(schema, lr)
+        iter = tbl.select(tbl.nom, age0=tbl.nom - 1)
+        try:
+            list(iter)
+            raise AssertionError("an exception should be raised")
+        except IterException as e:
+            assert "compiled" in str(e)
+
+    def test_select_after_orderby(self):
+        le = [{"nom": "j", "age": 10, "gender": "M"},
+              {"nom": "jean", "age": 40, "gender": "M"},
+              {"nom": "jeanne", "age": 2, "gender": "F"}]
+        tbl = IterRow(None, le)
+
+        iter = tbl.orderby(tbl.age)
+        iter2 = iter.select(iter.nom, age2=iter.age * 2)
+        res = list(iter2)
+        exp = [{'nom': 'jeanne', 'age2': 4},
+               {'nom': 'j', 'age2': 20},
+               {'nom': 'jean', 'age2': 80}]
+        if res != exp:
+            raise ValueError(str(res))
+
+
+if __name__ == "__main__":
+    unittest.main()
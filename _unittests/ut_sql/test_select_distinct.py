@@ -0,0 +1,62 @@
+"""
+@brief      test log(time=1s)
+"""
+import unittest
+import random
+from pysqllike.generic.iter_rows import IterRow
+from pysqllike.generic.iter_exceptions import IterException
+from pysqllike.generic.iter_spill import external_distinct
+
+
+class TestSelectDistinct (unittest.TestCase):
+
+    def test_distinct(self):
+        le = [{"nom": "j", "age": 10, "gender": "M"},
+              {"nom": "jean", "age": 40, "gender": "M"},
+              {"nom": "jeanne", "age": 2, "gender": "F"},
+              {"nom": "j", "age": 10, "gender": "M"}]
+        tbl = IterRow(None, le)
+        iter = tbl.distinct(tbl.gender)
+        res = list(iter)
+        self.assertEqual(res, [{'gender': 'M'}, {'gender': 'F'}])
+        self.assertEqual(iter.Plan["op"], "distinct")
+
+        tbl = IterRow(None, le)
+        res = list(tbl.distinct(as_dict=False))
+        self.assertEqual(res, [('j', 10, 'M'), ('jean', 40, 'M'),
+                               ('jeanne', 2, 'F')])
+
+        tbl = IterRow(None, le)
+        sel = tbl.select(tbl.nom, g=tbl.gender)
+        dis = sel.distinct(sel.g, sel.nom)
+        res = list(dis.select(dis.nom))
+        self.assertEqual(res, [{'nom': 'j'}, {'nom': 'jean'},
+                               {'nom': 'jeanne'}])
+
+        tbl2 = IterRow(None, le)
+        self.assertRaises(IterException, lambda: tbl.distinct(tbl2.nom))
+
+    def test_distinct_memory_limit(self):
+        rnd = random.Random(0)
+        le = [{"a": rnd.randint(0, 40), "b": rnd.randint(0, 3)}
+              for i in range(500)]
+        tbl = IterRow(None, le)
+        res = list(tbl.distinct(tbl.a, tbl.b, as_dict=False,
+                                memory_limit=1000))
+        exp = set((r["a"], r["b"]) for r in le)
+        self.assertEqual(len(res), len(exp))
+        self.assertEqual(set(res), exp)
+
+    def test_external_distinct(self):
+        values = [(i % 37, i) for i in range(300)]
+        for depth in [0, 1, 3]:
+            res = list(external_distinct(values, key=lambda x: x[0],
+                                         memory_limit=100, partitions=3,
+                                         max_depth=depth))
+            self.assertEqual(sorted(res), [(i, i) for i in range(37)])
+        res = list(external_distinct(values, key=lambda x: x[0]))
+        self.assertEqual(res, [(i, i) for i in range(37)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,8 +2,16 @@
 @brief      test log(time=1s)
 """
 import unittest
+import random
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pysqllike.generic.iter_rows import IterRow
-from pysqllike.generic.iter_exceptions import NotAllowedOperation
+from pysqllike.generic import iter_spill
+from pysqllike.generic.iter_spill import external_aggregate, SpillFile
+from pysqllike.generic.iter_parallel import find_heavy_hitters, partition_rows
+from pysqllike.generic.iter_exceptions import NotAllowedOperation, IterException
+from pysqllike.generic.column_type import ColumnGroupType
+from pysqllike.generic.column_group_operator import (
+    ColumnGroupOperator, OperatorGroupAvg, OperatorGroupLen)
 
 
 class TestSelectGroupBy (unittest.TestCase):
@@ -61,6 +69,238 @@ class TestSelectGroupBy (unittest.TestCase):
         except NotAllowedOperation:
             pass
 
+    def test_groupby_hash(self):
+        le = [{"nom": "j", "age": 10, "gender": "M"},
+              {"nom": "jean", "age": 40, "gender": "M"},
+              {"nom": "jeanne", "age": 2, "gender": "F"}]
+        tbl = IterRow(None, le)
+
+        iter = tbl.groupby(tbl.gender, sort_keys=False,
+                           len_nom=tbl.nom.len(), avg_age=tbl.age.avg())
+        res = list(iter)
+        exp = [{'gender': 'M', 'len_nom': 2, 'avg_age': 25.0},
+               {'gender': 'F', 'len_nom': 1, 'avg_age': 2.0}]
+        if res != exp:
+            raise ValueError(str(res))
+
+        tbl = IterRow(None, le)
+        iter = tbl.groupby(tbl.gender, as_dict=False, avg_age=tbl.age.avg())
+        res = list(iter)
+        exp = [('F', 2.0), ('M', 25.0)]
+        if res != exp:
+            raise ValueError(str(res))
+
+        tbl = IterRow(None, le)
+        iter = tbl.groupby(tbl.gender, avg_age=(tbl.age * 2).avg())
+        sele = iter.select(iter.gender, avg2=iter.avg_age + 1)
+        res = list(sele)
+        exp = [{'gender': 'F', 'avg2': 5.0}, {'gender': 'M', 'avg2': 51.0}]
+        if res != exp:
+            raise ValueError(str(res))
+
+    def test_group_accumulator(self):
+        for op, values, exp in [(OperatorGroupLen(), [1, 2, 3, 4], 4),
+                                (OperatorGroupAvg(), [1, 2, 3, 6], 3.0)]:
+            st1 = op.init()
+            for v in values[:2]:
+                st1 = op.update(st1, v)
+            st2 = op.init()
+            for v in values[2:]:
+                st2 = op.update(st2, v)
+            res = op.finalize(op.merge(st1, st2))
+            self.assertEqual(res, exp)
+            self.assertEqual(op.finalize(op.merge(op.init(), st2)),
+                             op(values[2:]))
+
+        class OperatorGroupMax(ColumnGroupOperator):
+
+            def __str__(self):
+                return "max"
+
+            def __call__(self, columns):
+                return max(columns)
+
+        le = [{"nom": "j", "age": 10, "gender": "M"},
+              {"nom": "jean", "age": 40, "gender": "M"},
+              {"nom": "jeanne", "age": 2, "gender": "F"}]
+        tbl = IterRow(None, le)
+        mx = ColumnGroupType("__unk__", int, parent=(tbl.age,),
+                             op=OperatorGroupMax())
+        iter = tbl.groupby(tbl.gender, mx=mx)
+        res = list(iter)
+        exp = [{'gender': 'F', 'mx': 2}, {'gender': 'M', 'mx': 40}]
+        if res != exp:
+            raise ValueError(str(res))
+
+    def test_groupby_having(self):
+        le = [{"nom": "j", "age": 10, "gender": "M"},
+              {"nom": "jean", "age": 40, "gender": "M"},
+              {"nom": "jeanne", "age": 2, "gender": "F"},
+              {"nom": "jo", "age": 7, "gender": "X"},
+              {"nom": "je", "age": 9, "gender": "X"}]
+        tbl = IterRow(None, le)
+        nb = tbl.nom.len()
+        iter = tbl.groupby(tbl.gender, nb=nb, having=nb > 1)
+        res = list(iter)
+        exp = [{'gender': 'M', 'nb': 2}, {'gender': 'X', 'nb': 2}]
+        if res != exp:
+            raise ValueError(str(res))
+
+        # the condition uses an aggregated column which is not returned
+        # and a key
+        tbl = IterRow(None, le)
+        iter = tbl.groupby(tbl.gender, nb=tbl.nom.len(), as_dict=False,
+                           having=(tbl.age.sum() < 20) & (tbl.gender != "F"))
+        res = list(iter)
+        self.assertEqual(res, [('X', 2)])
+
+        # a column neither grouped nor aggregated has no value for a group
+        tbl = IterRow(None, le)
+        self.assertRaises(IterException, lambda: tbl.groupby(
+            tbl.gender, nb=tbl.nom.len(), having=tbl.age > 2))
+        self.assertRaises(IterException, lambda: tbl.groupby(
+            tbl.gender, nb=tbl.nom.len(), having=(tbl.age.sum() > 2) & (tbl.nom != "j")))
+
+        # compiled and batch modes read the interpreted results
+        for mode in ["compile", "batch"]:
+            tbl = IterRow(None, le)
+            nb = tbl.nom.len()
+            iter = tbl.groupby(tbl.gender, nb=nb, having=nb > 1)
+            sel = iter.select(iter.gender, nb2=iter.nb * 2)
+            res = list(sel.compile() if mode == "compile" else sel.batch())
+            self.assertEqual(res, [{'gender': 'M', 'nb2': 4},
+                                   {'gender': 'X', 'nb2': 4}])
+
+    def test_groupby_memory_limit(self):
+        rnd = random.Random(0)
+        le = [{"user": "u%d" % rnd.randint(0, 300), "v": rnd.randint(0, 9)}
+              for i in range(2000)]
+
+        def run(memory_limit, sort_keys):
+            tbl = IterRow(None, le)
+            iter = tbl.groupby(tbl.user, as_dict=False, sort_keys=sort_keys,
+                               memory_limit=memory_limit,
+                               n=tbl.v.len(), s=tbl.v.sum(), a=tbl.v.avg(),
+                               f=tbl.v.first(), la=tbl.v.last(),
+                               cd=tbl.v.count_distinct(),
+                               li=ColumnGroupType("__unk__", int, parent=(tbl.v,),
+                                                  op=OperatorGroupAvg()))
+            return list(iter)
+
+        exp = run(None, True)
+        res = run(2000, True)
+        self.assertEqual(res, exp)
+        res = run(2000, False)
+        self.assertEqual(sorted(res), exp)
+
+    def test_external_aggregate(self):
+        values = [(i % 37, i) for i in range(1000)]
+        for depth in [0, 1, 3]:
+            res = external_aggregate(values, key=lambda x: x[0],
+                                     init=lambda x: [x[1]],
+                                     update=lambda agg, x: agg.append(x[1]),
+                                     merge=lambda a, b: a + b,
+                                     memory_limit=300, partitions=3,
+                                     max_depth=depth)
+            res = sorted(res)
+            self.assertEqual(len(res), 37)
+            for k, agg in res:
+                self.assertEqual(agg, list(range(k, 1000, 37)))
+
+    def test_external_aggregate_growing_state(self):
+        # few groups but every state grows, the limit is reached after the groups are created
+        created = []
+
+        class CountSpillFile(SpillFile):
+
+            def __init__(self, *args, **kwargs):
+                created.append(self)
+                SpillFile.__init__(self, *args, **kwargs)
+
+        values = [(i % 3, i) for i in range(20000)]
+        iter_spill.SpillFile = CountSpillFile
+        try:
+            res = external_aggregate(values, key=lambda x: x[0],
+                                     init=lambda x: {x[1]},
+                                     update=lambda agg, x: agg.add(x[1]),
+                                     merge=lambda a, b: a | b,
+                                     memory_limit=10000, partitions=2, max_depth=1)
+            res = sorted(res)
+            self.assertGreater(len(created), 0)
+
+            del created[:]
+            tbl = IterRow(None, [{"g": k, "v": v} for k, v in values])
+            res2 = list(tbl.groupby(tbl.g, c=tbl.v.count_distinct(), memory_limit=10000,
+                                    as_dict=False))
+            self.assertGreater(len(created), 0)
+        finally:
+            iter_spill.SpillFile = SpillFile
+        self.assertEqual([k for k, agg in res], [0, 1, 2])
+        for k, agg in res:
+            self.assertEqual(agg, set(range(k, 20000, 3)))
+        self.assertEqual(res2, [(k, len(agg)) for k, agg in res])
+
+    def test_groupby_parallel(self):
+        rnd = random.Random(0)
+        # one key receives half of the rows
+        le = [{"user": "hot" if i % 2 == 0 else "u%d" % rnd.randint(0, 50),
+               "v": rnd.randint(0, 9), "i": i} for i in range(5000)]
+
+        def run(n_jobs, executor=None):
+            tbl = IterRow(None, le)
+            it = tbl.groupby(tbl.user, as_dict=False, n_jobs=n_jobs,
+                             executor=executor,
+                             n=tbl.v.len(), s=tbl.v.sum(), a=tbl.v.var(),
+                             f=tbl.i.first(), la=tbl.i.last(),
+                             cd=tbl.v.count_distinct(),
+                             li=ColumnGroupType("__unk__", int, parent=(tbl.i,),
+                                                op=OperatorGroupAvg()))
+            return sorted(it)
+
+        exp = run(None)
+
+        def check(res):
+            # the variance is computed by merging partial states
+            self.assertEqual(len(res), len(exp))
+            for r, e in zip(res, exp):
+                self.assertEqual(r[:3] + r[4:], e[:3] + e[4:])
+                self.assertAlmostEqual(r[3], e[3])
+
+        check(run(2))
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            check(run(3, executor))
+            # every worker is a task running until the end
+            self.assertRaises(ValueError, lambda: run(4, executor))
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            check(run(2, executor))
+
+        tbl = IterRow(None, le)
+        self.assertRaises(ValueError, lambda: tbl.groupby(
+            tbl.user, n=tbl.v.len(), n_jobs=2, memory_limit=1000))
+
+    def test_partition_rows(self):
+        items = [("hot" if i % 2 == 0 else "k%d" % (i % 7), i) for i in range(4000)]
+        parts = list(partition_rows(items, 4, sample_size=100, chunk_size=100))
+        self.assertEqual([v for w, k, v in parts], list(range(4000)))
+        workers = {}
+        for w, (key, salt), v in parts:
+            workers.setdefault(key, set()).add(w)
+            if key == "hot":
+                self.assertEqual(salt, v // 2 // 100)
+            else:
+                self.assertEqual(salt, 0)
+        # the frequent key is split between all workers, the others go to one worker
+        self.assertEqual(workers["hot"], {0, 1, 2, 3})
+        for key, ws in workers.items():
+            if key != "hot":
+                self.assertEqual(len(ws), 1)
+
+    def test_find_heavy_hitters(self):
+        keys = ["a"] * 50 + ["b"] * 20 + list(range(30))
+        self.assertEqual(find_heavy_hitters(keys, 4), {"a", "b"})
+        self.assertEqual(find_heavy_hitters(keys, 1), set())
+        self.assertEqual(find_heavy_hitters([], 4), set())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,91 @@
+"""
+@brief      test log(time=1s)
+"""
+import unittest
+import random
+from pysqllike.generic.iter_rows import IterRow
+from pysqllike.generic.iter_exceptions import IterException
+from pysqllike.generic.column_type import NA
+
+
+class TestSelectGroupingSets (unittest.TestCase):
+
+    def _data(self):
+        rnd = random.Random(0)
+        return [{"a": rnd.choice("xyz"), "b": rnd.randint(0, 3),
+                 "v": rnd.randint(0, 100)} for i in range(200)]
+
+    @staticmethod
+    def _norm(rows):
+        return [tuple(None if isinstance(v, NA) else v for v in r)
+                for r in rows]
+
+    def _expected(self, data, keys):
+        tbl = IterRow(None, data)
+        cols = [getattr(tbl, k) for k in keys]
+        iter = tbl.groupby(*cols, as_dict=False, s=tbl.v.sum(),
+                           n=tbl.v.len(), m=tbl.v.avg(), d=tbl.v.var())
+        rows = []
+        for r in iter:
+            vals = dict(zip(keys, r[:len(keys)]))
+            rows.append(tuple(vals.get(k) for k in "ab") + r[len(keys):])
+        return rows
+
+    def _check(self, res, exp):
+        self.assertEqual(len(res), len(exp))
+        for r, e in zip(res, exp):
+            self.assertEqual(r[:4], e[:4])
+            self.assertAlmostEqual(r[4], e[4])
+            self.assertAlmostEqual(r[5], e[5])
+
+    def test_groupby_sets(self):
+        data = self._data()
+        tbl = IterRow(None, data)
+        iter = tbl.groupby_sets([[tbl.a, tbl.b], [tbl.b], []], as_dict=False,
+                                s=tbl.v.sum(), n=tbl.v.len(), m=tbl.v.avg(),
+                                d=tbl.v.var())
+        self.assertEqual([c.Name for c in iter.Schema],
+                         ["a", "b", "s", "n", "m", "d"])
+        res = self._norm(iter)
+        exp = self._expected(data, "ab") + self._expected(data, "b")
+        tbl = IterRow([("a", str), ("b", int), ("v", int)],
+                      [("", 0, r["v"]) for r in data])
+        total = list(tbl.groupby(s=tbl.v.sum(), n=tbl.v.len(),
+                                 m=tbl.v.avg(), d=tbl.v.var(),
+                                 as_dict=False))
+        exp.append((None, None) + total[0])
+        self._check(res, exp)
+
+    def test_rollup_cube(self):
+        data = self._data()
+        tbl = IterRow(None, data)
+        res = self._norm(tbl.rollup(tbl.a, tbl.b, as_dict=False,
+                                    s=tbl.v.sum(), n=tbl.v.len(),
+                                    m=tbl.v.avg(), d=tbl.v.var()))
+        exp = self._expected(data, "ab") + self._expected(data, "a")
+        self._check(res[:-1], exp)
+        self.assertEqual(res[-1][:3], (None, None, sum(r["v"] for r in data)))
+
+        tbl = IterRow(None, data)
+        iter = tbl.cube(tbl.a, tbl.b, s=tbl.v.sum())
+        self.assertEqual(iter.Plan["sets"], [["a", "b"], ["a"], ["b"], []])
+        res = list(iter)
+        self.assertEqual(len(res), 12 + 3 + 4 + 1)
+        self.assertEqual(res[12]["a"], "x")
+        self.assertIsInstance(res[12]["b"], NA)
+
+    def test_groupby_sets_empty(self):
+        tbl = IterRow([("a", str), ("v", int)], [])
+        res = list(tbl.rollup(tbl.a, n=tbl.v.len(), as_dict=False))
+        self.assertEqual(len(res), 1)
+        self.assertEqual(res[0][1], 0)
+        res = list(tbl.groupby_sets([[]], a=tbl.v.avg(), s=tbl.v.sum()))
+        self.assertIsInstance(res[0]["a"], NA)
+        self.assertIsInstance(res[0]["s"], NA)
+        tbl = IterRow(None, self._data())
+        self.assertRaises(IterException,
+                          lambda: tbl.rollup(tbl.a, v=tbl.v))
+
+
+if __name__ == "__main__":
+    unittest.main()
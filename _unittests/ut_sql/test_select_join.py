@@ -0,0 +1,262 @@
+"""
+@brief      test log(time=1s)
+"""
+import unittest
+import random
+from pysqllike.generic.iter_rows import IterRow
+from pysqllike.generic.iter_exceptions import SchemaException, IterException
+from pysqllike.generic.iter_join import hash_join, grace_hash_join, merge_join, key_getter
+from pysqllike.generic.others_types import NA
+from pysqllike.generic.column_type import CFT
+
+
+class TestSelectJoin (unittest.TestCase):
+
+    def _tables(self):
+        le = [{"nom": "j", "age": 10, "gender": "M"},
+              {"nom": "jean", "age": 40, "gender": "M"},
+              {"nom": "jeanne", "age": 2, "gender": "F"},
+              {"nom": "jo", "age": 30, "gender": "X"}]
+        ri = [{"gender": "M", "label": "male"},
+              {"gender": "F", "label": "female"},
+              {"gender": "U", "label": "unknown"}]
+        return IterRow(None, le), IterRow(None, ri)
+
+    @staticmethod
+    def _na(res):
+        # NA instances are all different
+        return [{k: "NA" if isinstance(v, NA) else v for k, v in r.items()}
+                for r in res]
+
+    def test_join_inner(self):
+        tbl, tbl2 = self._tables()
+        iter = tbl.join(tbl2, on="gender")
+        self.assertEqual([c.Name for c in iter.Schema],
+                         ["nom", "age", "gender", "label"])
+        res = list(iter)
+        exp = [{'nom': 'j', 'age': 10, 'gender': 'M', 'label': 'male'},
+               {'nom': 'jean', 'age': 40, 'gender': 'M', 'label': 'male'},
+               {'nom': 'jeanne', 'age': 2, 'gender': 'F', 'label': 'female'}]
+        if res != exp:
+            raise ValueError(str(res))
+        self.assertEqual(iter.Plan["op"], "join")
+
+        for build in ["left", "right"]:
+            tbl, tbl2 = self._tables()
+            res2 = list(tbl.join(tbl2, on=tbl.gender, build=build))
+            self.assertEqual(sorted(res2, key=str), sorted(exp, key=str))
+
+    def test_join_outer(self):
+        tbl, tbl2 = self._tables()
+        res = self._na(tbl.join(tbl2, on="gender", how="left"))
+        self.assertEqual(len(res), 4)
+        self.assertEqual(res[3], {'nom': 'jo', 'age': 30,
+                                  'gender': 'X', 'label': 'NA'})
+
+        for build in ["left", "right"]:
+            tbl, tbl2 = self._tables()
+            res = self._na(tbl.join(tbl2, on="gender", how="right",
+                                    build=build))
+            self.assertEqual(len(res), 4)
+            self.assertIn({'nom': 'NA', 'age': 'NA', 'gender': 'U',
+                           'label': 'unknown'}, res)
+
+            tbl, tbl2 = self._tables()
+            res = self._na(tbl.join(tbl2, on="gender", how="full",
+                                    build=build))
+            self.assertEqual(len(res), 5)
+            self.assertEqual(sorted(r["gender"] for r in res),
+                             ["F", "M", "M", "U", "X"])
+
+    def test_join_outer_null_key(self):
+        # a key containing None does not match anything
+        for how in ["left", "full"]:
+            tbl = IterRow([("k", None), ("v", int)], [{"k": None, "v": 1}, {"k": 2, "v": 2}])
+            tbl2 = IterRow([("k", None), ("w", int)], [{"k": None, "w": 3}, {"k": 2, "w": 4}])
+            res = self._na(tbl.join(tbl2, on="k", how=how))
+            self.assertIn({"k": None, "v": 1, "w": "NA"}, res)
+            self.assertIn({"k": 2, "v": 2, "w": 4}, res)
+            self.assertEqual(len(res), 2 if how == "left" else 3)
+
+        # the expressions after a join read the joined rows
+        tbl, tbl2 = self._tables()
+        iter = tbl.join(tbl2, on="gender", how="left")
+        sel = iter.select(iter.nom, n=CFT(len, iter.nom), a=iter.age + 1)
+        self.assertEqual(list(sel)[3], {"nom": "jo", "n": 2, "a": 31})
+
+    def test_join_select(self):
+        tbl, tbl2 = self._tables()
+        iter = tbl.join(tbl2, on=("gender", "gender"), as_dict=False)
+        sel = iter.select(iter.nom, iter.label, age2=iter.age * 2)
+        res = list(sel)
+        exp = [{'nom': 'j', 'label': 'male', 'age2': 20},
+               {'nom': 'jean', 'label': 'male', 'age2': 80},
+               {'nom': 'jeanne', 'label': 'female', 'age2': 4}]
+        if res != exp:
+            raise ValueError(str(res))
+
+        tbl, tbl2 = self._tables()
+        self.assertRaises(SchemaException, lambda: tbl.join(tbl2, on="nom"))
+        self.assertRaises(ValueError,
+                          lambda: tbl.join(tbl2, on="gender", how="cross"))
+
+    def test_hash_join(self):
+        left = [(1, "a"), (2, "b"), (None, "c"), (2, "d")]
+        right = [(2, "x"), (3, "y"), (None, "z")]
+        res = list(hash_join(left, right, key_getter([0]), key_getter([0]),
+                             how="full"))
+        self.assertEqual(res, [((1, "a"), None), ((2, "b"), (2, "x")),
+                               ((None, "c"), None), ((2, "d"), (2, "x")),
+                               (None, (3, "y")), (None, (None, "z"))])
+
+    def test_join_memory_limit(self):
+        rnd = random.Random(0)
+        le = [{"id": i, "k": rnd.randint(0, 60)} for i in range(300)]
+        ri = [{"k": k, "v": "v%d" % k} for k in range(0, 80, 2)]
+        ri.append({"k": 10, "v": "again"})
+        for how in ["inner", "left", "right", "full"]:
+            for build in ["left", "right"]:
+                exp = self._na(IterRow(None, le).join(
+                    IterRow(None, ri), on="k", how=how, build=build))
+                tbl, tbl2 = IterRow(None, le), IterRow(None, ri)
+                iter = tbl.join(tbl2, on="k", how=how, build=build,
+                                memory_limit=500)
+                self.assertEqual(iter.Plan["algorithm"], "grace")
+                res = self._na(iter)
+                self.assertEqual(sorted(res, key=str), sorted(exp, key=str))
+
+    def test_grace_hash_join(self):
+        left = [(i % 5, i) for i in range(100)]
+        right = [(i % 7, -i) for i in range(50)]
+        exp = list(hash_join(left, right, key_getter([0]), key_getter([0]),
+                             how="full"))
+        # max_depth=1: every key is repeated, partitions are too big
+        for depth in [1, 3]:
+            res = list(grace_hash_join(left, right, key_getter([0]),
+                                       key_getter([0]), how="full",
+                                       memory_limit=100, partitions=3,
+                                       max_depth=depth))
+            self.assertEqual(sorted(res, key=str), sorted(exp, key=str))
+
+    def test_join_merge(self):
+        rnd = random.Random(0)
+        le = [{"id": i, "k": rnd.randint(0, 30)} for i in range(100)]
+        ri = [{"k": k, "v": "v%d" % k} for k in range(0, 40, 2)]
+        ri.append({"k": 10, "v": "again"})
+        for how in ["inner", "left", "right", "full"]:
+            for ascending in [True, False]:
+                exp = self._na(IterRow(None, le).join(
+                    IterRow(None, ri), on="k", how=how))
+                tbl, tbl2 = IterRow(None, le), IterRow(None, ri)
+                left = tbl.orderby(tbl.k, ascending=ascending)
+                right = tbl2.orderby(tbl2.k, tbl2.v, ascending=ascending)
+                iter = left.join(right, on="k", how=how)
+                self.assertEqual(iter.Plan["algorithm"], "merge")
+                res = self._na(iter)
+                self.assertEqual(sorted(res, key=str), sorted(exp, key=str))
+                keys = [r["k"] for r in res]
+                self.assertEqual(keys, sorted(keys, reverse=not ascending))
+
+        # the order is unknown or different
+        tbl, tbl2 = IterRow(None, le), IterRow(None, ri)
+        iter = tbl.orderby(tbl.k).join(tbl2, on="k")
+        self.assertEqual(iter.Plan["algorithm"], "hash")
+        tbl, tbl2 = IterRow(None, le), IterRow(None, ri)
+        iter = tbl.orderby(tbl.k).join(
+            tbl2.orderby(tbl2.k, ascending=False), on="k")
+        self.assertEqual(iter.Plan["algorithm"], "hash")
+
+    def test_join_declare_sorted(self):
+        tbl = IterRow(None, [{"k": 1, "a": "a"}, {"k": 3, "a": "b"}])
+        tbl2 = IterRow(None, [{"k": 1, "b": 0}, {"k": 2, "b": 1},
+                              {"k": 3, "b": 2}])
+        iter = tbl.declare_sorted(tbl.k).join(tbl2.declare_sorted("k"),
+                                              on="k", how="right")
+        self.assertEqual(iter.Plan["algorithm"], "merge")
+        res = self._na(iter)
+        self.assertEqual(res, [{'k': 1, 'a': 'a', 'b': 0},
+                               {'k': 2, 'a': 'NA', 'b': 1},
+                               {'k': 3, 'a': 'b', 'b': 2}])
+        self.assertRaises(SchemaException, lambda: tbl.declare_sorted("zz"))
+
+        # wrong declaration
+        tbl = IterRow(None, [{"k": 3, "a": "a"}, {"k": 1, "a": "b"}])
+        tbl2 = IterRow(None, [{"k": 1, "b": 0}])
+        iter = tbl.declare_sorted("k").join(tbl2.declare_sorted("k"), on="k")
+        self.assertRaises(IterException, lambda: list(iter))
+
+    def test_merge_join(self):
+        left = [(1, "a"), (2, "b"), (2, "c"), (4, "d")]
+        right = [(0, "w"), (2, "x"), (2, "y"), (3, "z")]
+        res = list(merge_join(left, right, key_getter([0]), key_getter([0]),
+                              how="full"))
+        self.assertEqual(res, [(None, (0, "w")), ((1, "a"), None),
+                               ((2, "b"), (2, "x")), ((2, "b"), (2, "y")),
+                               ((2, "c"), (2, "x")), ((2, "c"), (2, "y")),
+                               (None, (3, "z")), ((4, "d"), None)])
+
+        # a null key matches nothing, as with a hash join
+        left = [(None, 1), (None, 2), (2, "b")]
+        right = [(None, 3), (2, "x")]
+        for how in ["inner", "left", "right", "full"]:
+            res = list(merge_join(left, right, key_getter([0]), key_getter([0]), how=how))
+            exp = list(hash_join(left, right, key_getter([0]), key_getter([0]), how=how))
+            self.assertEqual(sorted(res, key=str), sorted(exp, key=str))
+        res = list(merge_join(left, right, key_getter([0]), key_getter([0]), how="full"))
+        self.assertEqual(res, [((None, 1), None), ((None, 2), None),
+                               (None, (None, 3)), ((2, "b"), (2, "x"))])
+
+    def test_join_pushdown(self):
+        calls = []
+
+        def double(x):
+            calls.append(x)
+            return x * 2
+
+        le = [{"id": i, "k": i % 10} for i in range(100)]
+        ri = [{"k": 3, "v": "a"}, {"k": 5, "v": "b"}]
+        tbl, tbl2 = IterRow(None, le), IterRow(None, ri)
+        sel = tbl.select(tbl.k, tbl.id, d=CFT(double, tbl.id))
+        wher = sel.where(sel.id < 90)
+        iter = wher.join(tbl2, on="k")
+        self.assertTrue(iter.Plan["pushdown"])
+        res = list(iter)
+        self.assertEqual(len(res), 18)
+        self.assertEqual(sorted(r["d"] for r in res),
+                         sorted(2 * i for i in range(90) if i % 10 in (3, 5)))
+        # the function is only called for rows which can match
+        self.assertEqual(len(calls), 20)
+        self.assertEqual(len(list(tbl)), 100)
+
+        # the source is not modified while the join is read
+        tbl, tbl2 = IterRow(None, le[:20]), IterRow(None, ri)
+        sel = tbl.select(tbl.k, tbl.id)
+        join = sel.join(tbl2, on="k")
+        self.assertTrue(join.Plan["pushdown"])
+        it = (r for r in join)
+        first = next(it)
+        self.assertEqual(list(tbl), le[:20])
+        self.assertEqual([first] + list(it),
+                         [{"k": 3, "id": 3, "v": "a"}, {"k": 5, "id": 5, "v": "b"},
+                          {"k": 3, "id": 13, "v": "a"}, {"k": 5, "id": 15, "v": "b"}])
+
+        # left join, the rows of the probe side must be kept
+        del calls[:]
+        tbl, tbl2 = IterRow(None, le), IterRow(None, ri)
+        sel = tbl.select(tbl.k, tbl.id, d=CFT(double, tbl.id))
+        iter = sel.join(tbl2, on="k", how="left", build="right")
+        self.assertFalse(iter.Plan["pushdown"])
+        self.assertEqual(len(list(iter)), 100)
+        self.assertEqual(len(calls), 100)
+
+        # the key is modified, no pushdown below the select
+        del calls[:]
+        tbl, tbl2 = IterRow(None, le), IterRow(None, ri)
+        sel = tbl.select(tbl.id, k=tbl.k + 0, d=CFT(double, tbl.id))
+        iter = sel.join(tbl2, on="k")
+        self.assertEqual(len(list(iter)), 20)
+        self.assertEqual(len(calls), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+@brief      test log(time=1s)
+"""
+import unittest
+from pysqllike.generic.iter_rows import IterRow
+
+
+class TestSelectLimit (unittest.TestCase):
+
+    def _table(self):
+        lr = [{"nom": "j", "age": 10, "gender": "M"},
+              {"nom": "jean", "age": 40, "gender": "M"},
+              {"nom": "jeanne", "age": 2, "gender": "F"},
+              {"nom": "jo", "age": 30, "gender": "M"}]
+        return IterRow(None, lr)
+
+    def test_limit(self):
+        tbl = self._table()
+        iter = tbl.select(tbl.nom, age2=tbl.age * 2).limit(2, offset=1)
+        res = list(iter)
+        exp = [{'nom': 'jean', 'age2': 80}, {'nom': 'jeanne', 'age2': 4}]
+        if res != exp:
+            raise ValueError(str(res))
+
+        tbl = self._table()
+        res = list(tbl.limit(2, as_dict=False))
+        self.assertEqual(res, [('j', 10, 'M'), ('jean', 40, 'M')])
+        self.assertEqual(list(self._table().limit(0)), [])
+
+    def test_limit_close(self):
+        state = dict(read=0, closed=False)
+
+        def source():
+            try:
+                for i in range(1000):
+                    state["read"] += 1
+                    yield {"a": i}
+            finally:
+                state["closed"] = True
+
+        tbl = IterRow([("a", int)], source())
+        iter = tbl.select(tbl.a, b=tbl.a + 1)
+        wher = iter.where(iter.b > 3)
+        res = list(wher.limit(3))
+        self.assertEqual([r["a"] for r in res], [3, 4, 5])
+        self.assertEqual(state["read"], 6)
+        self.assertTrue(state["closed"])
+
+    def test_limit_orderby(self):
+        tbl = self._table()
+        iter = tbl.orderby(tbl.age, ascending=False).limit(2, offset=1)
+        self.assertEqual(iter.Plan["inputs"][0].Plan["limit"], 3)
+        res = list(iter)
+        exp = [{'nom': 'jo', 'age': 30, 'gender': 'M'},
+               {'nom': 'j', 'age': 10, 'gender': 'M'}]
+        if res != exp:
+            raise ValueError(str(res))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+@brief      test log(time=1s)
+"""
+import unittest
+import random
+from pysqllike.generic.iter_rows import IterRow
+from pysqllike.generic.iter_exceptions import SchemaException
+
+
+class TestSelectMergeSorted (unittest.TestCase):
+
+    def _parts(self):
+        rnd = random.Random(0)
+        return [[{"day": d, "v": rnd.randint(0, 100)} for i in range(20)]
+                for d in range(4)]
+
+    def test_merge_sorted(self):
+        parts = self._parts()
+        for ascending in [True, False]:
+            tbls = [IterRow(None, p) for p in parts]
+            tbls = [t.orderby(t.v, ascending=ascending) for t in tbls]
+            res = list(tbls[0].merge_sorted(tbls[1:]))
+            exp = [r for p in parts for r in p]
+            exp = sorted(exp, key=lambda r: r["v"], reverse=not ascending)
+            self.assertEqual([r["v"] for r in res], [r["v"] for r in exp])
+            self.assertEqual(sorted(res, key=str), sorted(exp, key=str))
+
+        tbls = [IterRow(None, sorted(p, key=lambda r: r["v"]))
+                for p in parts]
+        mer = tbls[0].merge_sorted(tbls[1:], key=tbls[0].v, as_dict=False)
+        res = list(mer)
+        self.assertEqual([r[1] for r in res],
+                         sorted(r["v"] for p in parts for r in p))
+        self.assertEqual(mer.Plan["keys"], ["v"])
+
+    def test_merge_sorted_errors(self):
+        parts = self._parts()
+        tbls = [IterRow(None, p) for p in parts]
+        self.assertRaises(SchemaException,
+                          lambda: tbls[0].merge_sorted(tbls[1:]))
+        tbls = [IterRow(None, p) for p in parts]
+        tbls = [tbls[0].orderby(tbls[0].v),
+                tbls[1].orderby(tbls[1].v, ascending=False)]
+        self.assertRaises(SchemaException,
+                          lambda: tbls[0].merge_sorted(tbls[1:]))
+        tbls = [IterRow(None, p) for p in parts]
+        self.assertRaises(SchemaException,
+                          lambda: tbls[0].merge_sorted(tbls[1:], key="w"))
+
+    def test_merge_sorted_join(self):
+        parts = self._parts()
+        tbls = [IterRow(None, p) for p in parts]
+        tbls = [t.orderby(t.v) for t in tbls]
+        mer = tbls[0].merge_sorted(tbls[1:])
+        dim = IterRow(None, [{"v": i, "label": "l%d" % i}
+                             for i in range(101)])
+        iter = mer.join(dim.declare_sorted("v"), on="v")
+        self.assertEqual(iter.Plan["algorithm"], "merge")
+        self.assertEqual(len(list(iter)), 80)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,9 @@
 @brief      test log(time=1s)
 """
 import unittest
+import random
 from pysqllike.generic.iter_rows import IterRow
+from pysqllike.generic.iter_spill import external_sort, SpillFile
 
 
 class TestSelectOrderBy (unittest.TestCase):
@@ -23,6 +25,57 @@ class TestSelectOrderBy (unittest.TestCase):
         if res != exp:
             raise ValueError(str(res))
 
+    def test_select_orderby_memory_limit(self):
+        rnd = random.Random(0)
+        le = [{"nom": "n%d" % i, "age": rnd.randint(0, 50)}
+              for i in range(500)]
+        for ascending in [True, False]:
+            tbl = IterRow(None, le)
+            iter = tbl.orderby(tbl.age, ascending=ascending,
+                               memory_limit=2000)
+            res = list(iter)
+            # the sort is stable
+            exp = sorted(le, key=lambda r: r["age"], reverse=not ascending)
+            if res != exp:
+                raise ValueError(str(res[:5]))
+
+        tbl = IterRow(None, le)
+        iter = tbl.orderby(tbl.age, tbl.nom, as_dict=False,
+                           memory_limit=2000)
+        res = list(iter)
+        exp = sorted((r["nom"], r["age"]) for r in le)
+        self.assertEqual(sorted(res), exp)
+        self.assertEqual([r[1] for r in res], sorted(r["age"] for r in le))
+
+    def test_external_sort(self):
+        values = [(i % 7, i) for i in range(100)]
+        res = list(external_sort(iter(values), key=lambda x: x[0],
+                                 memory_limit=300))
+        self.assertEqual(res, sorted(values, key=lambda x: x[0]))
+
+        sp = SpillFile(chunk_size=3)
+        sp.extend(values)
+        self.assertEqual(len(sp), 100)
+        self.assertEqual(list(sp), values)
+        sp.close()
+
+    def test_select_orderby_limit(self):
+        rnd = random.Random(0)
+        le = [{"nom": "n%d" % i, "age": rnd.randint(0, 50)}
+              for i in range(200)]
+        for ascending in [True, False]:
+            tbl = IterRow(None, le)
+            iter = tbl.orderby(tbl.age, ascending=ascending, limit=10)
+            res = list(iter)
+            exp = sorted(le, key=lambda r: r["age"],
+                         reverse=not ascending)[:10]
+            if res != exp:
+                raise ValueError(str(res))
+
+        tbl = IterRow(None, le)
+        iter = tbl.orderby(tbl.age, limit=0)
+        self.assertEqual(list(iter), [])
+
 
 if __name__ == "__main__":
     unittest.main()
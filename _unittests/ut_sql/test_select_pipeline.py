@@ -0,0 +1,106 @@
+# coding: utf-8
+"""
+@brief      test log(time=1s)
+"""
+import unittest
+from pysqllike.generic.iter_rows import IterRow
+from pysqllike.generic.column_type import CFT
+
+
+class TestSelectPipeline (unittest.TestCase):
+
+    def _table(self):
+        lr = [{"nom": "j", "age": 10, "gender": "M"},
+              {"nom": "jean", "age": 40, "gender": "M"},
+              {"nom": "jeanne", "age": 2, "gender": "F"}]
+        return IterRow(None, lr)
+
+    def test_pipeline_select_where(self):
+        tbl = self._table()
+        iter = tbl.select(tbl.nom, age2=tbl.age * 2)
+        wher = iter.where((iter.age2 > 5).And(iter.age2 < 50))
+        comp = wher.compile()
+        assert "for " in comp.Plan["code"]
+        res = list(comp)
+        exp = [{'nom': 'j', 'age2': 20}]
+        if res != exp:
+            raise ValueError(str(res))
+
+        lr = [("nom", 10), ("jean", 40)]
+        schema = [("nom", str), ("age", int)]
+        tbl = IterRow(schema, lr)
+
+        def myf(x, y):
+            return x * 2.5 + y
+        iter = tbl.select(tbl.nom, age0=CFT(myf, tbl.age, tbl.age))
+        res = list(iter.compile(as_dict=False))
+        exp = [('nom', 35.0), ('jean', 140.0)]
+        if res != exp:
+            raise ValueError(str(res))
+
+    def test_pipeline_groupby_orderby(self):
+        tbl = self._table()
+        iter = tbl.groupby(tbl.gender, len_nom=tbl.nom.len(),
+                           avg_age=tbl.age.avg())
+        res = list(iter.compile())
+        exp = [{'gender': 'F', 'len_nom': 1, 'avg_age': 2.0},
+               {'gender': 'M', 'len_nom': 2, 'avg_age': 25.0}]
+        if res != exp:
+            raise ValueError(str(res))
+
+        tbl = self._table()
+        iter = tbl.orderby(tbl.nom, ascending=False)
+        sele = iter.select(iter.nom, age2=iter.age + 1)
+        res = list(sele.compile())
+        exp = [{'nom': 'jeanne', 'age2': 3},
+               {'nom': 'jean', 'age2': 41},
+               {'nom': 'j', 'age2': 11}]
+        if res != exp:
+            raise ValueError(str(res))
+
+    def test_pipeline_constants(self):
+        # constants in the aggregated and downstream expressions
+        # must not be hidden by the local variables of the generated code
+        def group():
+            tbl = self._table()
+            return tbl.groupby(tbl.gender, s=(tbl.age * 2).sum(),
+                               m=(tbl.age * 2).min())
+
+        def select():
+            grp = group()
+            return grp.select(grp.gender, t=grp.s + grp.m * 3 + 1)
+
+        def order():
+            tbl = self._table()
+            ordr = tbl.orderby(tbl.age, ascending=False)
+            return ordr.select(ordr.nom, a=ordr.age * 2 + 7)
+
+        for build in [group, select, order]:
+            self.assertEqual(list(build().compile()), list(build()))
+        self.assertEqual(list(select().compile()),
+                         [{'gender': 'F', 't': 17}, {'gender': 'M', 't': 161}])
+
+    def test_pipeline_unionall(self):
+        tbl = self._table()
+        iter = tbl.where(tbl.age > 5).unionall(tbl.where(tbl.age < 5))
+        res = list(iter.compile())
+        assert len(res) == 3
+        assert [r["age"] for r in res] == [10, 40, 2]
+
+    def test_pipeline_fallback(self):
+        tbl = self._table()
+        iter = tbl.select(tbl.nom, age2=tbl.age * 2)
+        # the expression refers to a column of another table,
+        # the compiler leaves this operator to the interpreted engine
+        sele = iter.select(iter.nom, age3=iter.age2 + tbl.age)
+        wher = sele.where(sele.age3 > 10)
+        comp = wher.compile()
+        assert "_src" in comp.Plan["code"]
+        res = list(comp)
+        exp = [{'nom': 'j', 'age3': 30}, {'nom': 'jean', 'age3': 120}]
+        if res != exp:
+            raise ValueError(str(res))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+@brief      test log(time=1s)
+"""
+import unittest
+from pysqllike.generic.iter_rows import IterRow
+
+
+class TestSelectSemiJoin (unittest.TestCase):
+
+    def _tables(self):
+        le = [{"nom": "j", "age": 10, "gender": "M"},
+              {"nom": "jean", "age": 40, "gender": "M"},
+              {"nom": "jeanne", "age": 2, "gender": "F"},
+              {"nom": "jo", "age": 30, "gender": "X"}]
+        ri = [("M", "male"), ("M", "man"), ("U", "unknown")]
+        return IterRow(None, le), IterRow([("g", str), ("label", str)], ri)
+
+    def test_semijoin(self):
+        tbl, tbl2 = self._tables()
+        iter = tbl.semijoin(tbl2, on=(tbl.gender, tbl2.g))
+        res = list(iter)
+        exp = [{'nom': 'j', 'age': 10, 'gender': 'M'},
+               {'nom': 'jean', 'age': 40, 'gender': 'M'}]
+        if res != exp:
+            raise ValueError(str(res))
+        self.assertEqual(iter.Plan["op"], "semijoin")
+
+        tbl, tbl2 = self._tables()
+        iter = tbl.semijoin(tbl2, on=("gender", "g"))
+        sel = iter.select(iter.nom, age2=iter.age * 2)
+        self.assertEqual(list(sel), [{'nom': 'j', 'age2': 20},
+                                     {'nom': 'jean', 'age2': 80}])
+
+    def test_antijoin(self):
+        tbl, tbl2 = self._tables()
+        res = list(tbl.antijoin(tbl2, on=("gender", "g"), as_dict=False))
+        self.assertEqual(res, [('jeanne', 2, 'F'), ('jo', 30, 'X')])
+
+    def test_semijoin_keys_only(self):
+        read = []
+
+        def source():
+            for i in range(5):
+                row = {"k": i, "payload": "p%d" % i}
+                read.append(row)
+                yield row
+
+        tbl = IterRow(None, [{"k": i} for i in range(10)])
+        tbl2 = IterRow([("k", int), ("payload", str)], source())
+        res = list(tbl.semijoin(tbl2, on="k"))
+        self.assertEqual([r["k"] for r in res], list(range(5)))
+        self.assertEqual(len(read), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,8 @@
 import unittest
 from pysqllike.generic.iter_rows import IterRow
 from pysqllike.generic.column_type import NA
+from pysqllike.generic.iter_exceptions import SchemaException
+from pysqllike.generic.iter_concurrent import concurrent_chain
 
 
 class TestSelectUnion (unittest.TestCase):
@@ -62,6 +64,103 @@ class TestSelectUnion (unittest.TestCase):
         if res != exp:
             raise ValueError(str(res))
 
+    def test_select_union_distinct(self):
+        lr = [{"nom": "j", "age": 10, "gender": "M"},
+              {"nom": "jean", "age": 40, "gender": "M"},
+              {"nom": "jeanne", "age": 2, "gender": "F"}]
+        lr2 = [{"gender": "M", "age": 10, "nom": "j"},
+               {"gender": "F", "age": 5, "nom": "jo"},
+               {"gender": "F", "age": 5, "nom": "jo"}]
+
+        tbl, tbl2 = IterRow(None, lr), IterRow(None, lr2)
+        iter = tbl.union(tbl2, as_dict=False)
+        res = list(iter)
+        self.assertEqual(res, [('j', 10, 'M'), ('jean', 40, 'M'),
+                               ('jeanne', 2, 'F'), ('jo', 5, 'F')])
+        self.assertEqual(iter.Plan["op"], "union")
+
+        tbl, tbl2 = IterRow(None, lr), IterRow(None, lr2)
+        res = list(tbl.intersect(tbl2))
+        self.assertEqual(res, [{"nom": "j", "age": 10, "gender": "M"}])
+
+        tbl, tbl2 = IterRow(None, lr), IterRow(None, lr2)
+        res = list(tbl2.except_(tbl))
+        self.assertEqual(res, [{"gender": "F", "age": 5, "nom": "jo"}])
+
+    def test_select_union_merge_schema(self):
+        lr = [{"nom": "j", "age": 10}, {"nom": "j", "age": 10}]
+        lr2 = [{"nom": "j", "newage": 10}, {"nom": "j", "newage": 10}]
+        tbl, tbl2 = IterRow(None, lr), IterRow(None, lr2)
+        iter = tbl.union(tbl2, merge_schema=True)
+        res = list(iter)
+        self.assertEqual(len(res), 2)
+        self.assertEqual(sorted(c.Name for c in iter.Schema),
+                         ["age", "newage", "nom"])
+        self.assertIsInstance(res[0]["newage"], NA)
+        self.assertEqual(res[1]["newage"], 10)
+        self.assertIsInstance(res[1]["age"], NA)
+
+        tbl, tbl2 = IterRow(None, lr), IterRow(None, lr2)
+        self.assertRaises(SchemaException, lambda: tbl.intersect(tbl2))
+        tbl3 = IterRow(None, [{"nom": "j"}])
+        self.assertRaises(SchemaException, lambda: tbl.union(tbl3))
+
+    def test_select_unionall_many(self):
+        parts = [[{"day": d, "v": i} for i in range(d * 10)] for d in range(5)]
+        tbls = [IterRow([("day", int), ("v", int)], p) for p in parts]
+        uni = tbls[0].unionall_many(tbls[1:])
+        res = list(uni)
+        exp = [r for p in parts for r in p]
+        self.assertEqual(res, exp)
+        self.assertEqual(len(uni.Plan["inputs"]), 5)
+
+        for workers in [None, 2]:
+            tbls = [IterRow([("day", int), ("v", int)], iter(p))
+                    for p in parts]
+            res = list(tbls[0].unionall_many(tbls[1:], concurrent=True,
+                                             max_workers=workers,
+                                             as_dict=False))
+            self.assertEqual(sorted(res), sorted((r["day"], r["v"])
+                                                 for r in exp))
+            # the order is kept inside a table
+            self.assertEqual([r for r in res if r[0] == 4],
+                             [(4, i) for i in range(40)])
+
+        tbl = IterRow(None, [{"nom": "j", "age": 10}])
+        tbl2 = IterRow(None, [{"nom": "k", "newage": 10}])
+        tbl3 = IterRow(None, [{"x": 1, "nom": "l"}])
+        uni = tbl.unionall_many([tbl2, tbl3], merge_schema=True)
+        self.assertEqual([c.Name for c in uni.Schema],
+                         ["nom", "age", "newage", "x"])
+        res = list(uni)
+        self.assertEqual([r["nom"] for r in res], ["j", "k", "l"])
+        self.assertIsInstance(res[2]["age"], NA)
+        self.assertRaises(SchemaException,
+                          lambda: tbl.unionall_many([tbl2]))
+
+    def test_concurrent_chain(self):
+        state = dict(closed=0)
+
+        def gen(n):
+            try:
+                for i in range(n):
+                    yield i
+            finally:
+                state["closed"] += 1
+
+        def fail():
+            yield 1
+            raise ZeroDivisionError("fail")
+
+        res = concurrent_chain([gen(1000), gen(10)], chunk_size=7,
+                               queue_size=1)
+        first = [next(res) for i in range(5)]
+        self.assertEqual(len(first), 5)
+        res.close()
+        self.assertEqual(state["closed"], 2)
+        self.assertRaises(ZeroDivisionError,
+                          lambda: list(concurrent_chain([gen(10), fail()])))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,94 @@
+"""
+@brief      test log(time=1s)
+"""
+import unittest
+import random
+from pysqllike.generic.iter_rows import IterRow
+from pysqllike.generic.iter_exceptions import IterException
+from pysqllike.generic.column_type import NA
+from pysqllike.generic.column_group_operator import OperatorGroupVar, OperatorGroupMax
+from pysqllike.generic.column_group_operator import OperatorGroupLast, OperatorGroupAvg, OperatorGroupLen
+from pysqllike.generic.column_window_operator import OperatorWindowAggregate
+
+
+class TestSelectWindow (unittest.TestCase):
+
+    def _table(self):
+        le = [{"nom": "j", "day": 2, "amount": 5},
+              {"nom": "jean", "day": 1, "amount": 2},
+              {"nom": "j", "day": 1, "amount": 10},
+              {"nom": "j", "day": 3, "amount": 1},
+              {"nom": "jean", "day": 2, "amount": 2},
+              {"nom": "j", "day": 3, "amount": 4}]
+        return IterRow(None, le)
+
+    def test_window(self):
+        tbl = self._table()
+        iter = tbl.window(partition_by=tbl.nom, order_by=tbl.day,
+                          total=tbl.amount.cumsum(),
+                          prev=tbl.amount.lag(),
+                          mx=tbl.amount.max().over(preceding=1),
+                          rn=tbl.day.row_number(),
+                          rk=tbl.day.rank(),
+                          drk=tbl.day.rank(dense=True))
+        res = list(iter)
+        self.assertEqual([c.Name for c in iter.Schema],
+                         ["nom", "day", "amount", "total", "prev", "mx",
+                          "rn", "rk", "drk"])
+        self.assertIsInstance(res[0]["prev"], NA)
+        self.assertIsInstance(res[4]["prev"], NA)
+        for r in res:
+            r["prev"] = None if isinstance(r["prev"], NA) else r["prev"]
+        exp = [('j', 1, 10, 10, None, 10, 1, 1, 1),
+               ('j', 2, 5, 15, 10, 10, 2, 2, 2),
+               ('j', 3, 1, 16, 5, 5, 3, 3, 3),
+               ('j', 3, 4, 20, 1, 4, 4, 3, 3),
+               ('jean', 1, 2, 2, None, 2, 1, 1, 1),
+               ('jean', 2, 2, 4, 2, 2, 2, 2, 2)]
+        self.assertEqual([tuple(r.values()) for r in res], exp)
+        self.assertEqual(iter.Plan["op"], "window")
+        self.assertFalse(iter.Plan["presorted"])
+
+    def test_window_presorted_select(self):
+        tbl = self._table()
+        srt = tbl.orderby(tbl.nom, tbl.day, ascending=False)
+        iter = srt.window(partition_by=srt.nom, order_by=srt.day,
+                          ascending=False, as_dict=False,
+                          total=srt.amount.sum())
+        self.assertTrue(iter.Plan["presorted"])
+        sel = iter.select(iter.nom, t2=iter.total * 2)
+        res = list(sel)
+        self.assertEqual([r["t2"] for r in res], [4, 8, 2, 10, 20, 40])
+
+        tbl = self._table()
+        iter = tbl.window(rn=tbl.nom.row_number(), last=tbl.nom.lag(2, ""))
+        res = list(iter)
+        self.assertEqual([r["rn"] for r in res], [1, 2, 3, 4, 5, 6])
+        self.assertEqual([r["last"] for r in res][:4], ["", "", "j", "jean"])
+
+        tbl = self._table()
+        self.assertRaises(IterException,
+                          lambda: tbl.window(order_by=tbl.day, x=tbl.amount))
+        self.assertRaises(IterException,
+                          lambda: list(tbl.select(x=tbl.amount.cumsum())))
+
+    def test_window_frames(self):
+        rnd = random.Random(0)
+        values = [rnd.random() for i in range(50)]
+        for opgr in [OperatorGroupVar(), OperatorGroupMax(),
+                     OperatorGroupLast(), OperatorGroupAvg(), OperatorGroupLen()]:
+            for preceding in [0, 1, 4]:
+                op = OperatorWindowAggregate(opgr, preceding)
+                state = op.start()
+                res = [op.step(state, v, ()) for v in values]
+                exp = [opgr.accumulate(values[max(0, i - preceding):i + 1])
+                       for i in range(len(values))]
+                for a, b in zip(res, exp):
+                    if isinstance(b, NA):
+                        self.assertIsInstance(a, NA)
+                    else:
+                        self.assertAlmostEqual(a, b)
+
+
+if __name__ == "__main__":
+    unittest.main()
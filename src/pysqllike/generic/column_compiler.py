@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+@file
+@brief Compiles a tree of @see cl ColumnType into a single Python function.
+"""
+import re
+from .iter_exceptions import IterException
+from .column_operator import ColumnOperator
+from .column_type import ColumnType, ColumnConstantType, ColumnTableType
+from .column_type import ColumnGroupType, ColumnWindowType, CFT
+
+
+class ExpressionCompiler:
+
+    """
+    Converts expressions built with @see cl ColumnType into Python code.
+    Every node of the tree becomes an inline Python expression,
+    constants and functions are stored in the globals of the generated code.
+    Nodes the compiler does not know are called as they are
+    (interpreted evaluation).
+    """
+
+    def __init__(self):
+        """
+        constructor
+        """
+        self._globals = {'IterException': IterException}
+        self._names = {}
+        self._fallbacks = []
+        self._nnames = 0
+
+    @property
+    def Globals(self):
+        """
+        returns the globals of the generated code
+        """
+        return self._globals
+
+    @property
+    def Fallbacks(self):
+        """
+        returns the columns the compiler could not translate
+        """
+        return self._fallbacks
+
+    def new_name(self, prefix):
+        """
+        Returns a new variable name, the globals and the local variables
+        of the generated code share the same counter so that a local variable
+        never hides a global.
+
+        @param      prefix      prefix of the variable name
+        @return                 variable name
+        """
+        self._nnames += 1
+        return "{0}{1}".format(prefix, self._nnames)
+
+    def add_global(self, value, prefix="_g"):
+        """
+        Stores a value in the globals of the generated code.
+
+        @param      value       any object
+        @param      prefix      prefix of the variable name
+        @return                 variable name
+        """
+        key = id(value)
+        if key in self._names:
+            return self._names[key]
+        name = self.new_name(prefix)
+        self._globals[name] = value
+        self._names[key] = name
+        return name
+
+    def expression(self, column, inputs):
+        """
+        Returns the Python code which evaluates a column.
+
+        @param      column      @see cl ColumnType
+        @param      inputs      dictionary ``{ id(column): code }``, columns
+                                whose values are already known (boundaries)
+        @return                 string
+        """
+        key = id(column)
+        if key in inputs:
+            return inputs[key]
+        if isinstance(column, ColumnConstantType):
+            return self.add_global(column._const, "_k")
+        if isinstance(column, CFT):
+            args = [self.expression(p, inputs) for p in column._parent]
+            func = self.add_global(column._thisfunc, "_f")
+            return "{0}({1})".format(func, ", ".join(args))
+        if isinstance(column, (ColumnTableType, ColumnGroupType, ColumnWindowType)) or \
+                not isinstance(column, ColumnType) or \
+                column._func is not None or \
+                not isinstance(column._op, ColumnOperator) or \
+                not column._parent:
+            return self._fallback(column)
+        args = [self.expression(p, inputs) for p in column._parent]
+        try:
+            return column._op.code(args)
+        except NotImplementedError:
+            return self._fallback(column)
+
+    def _fallback(self, column):
+        """
+        Evaluates a column with the interpreted engine.
+        """
+        self._fallbacks.append(column)
+        return "{0}()".format(self.add_global(column, "_n"))
+
+    def compile(self, name, code):
+        """
+        Compiles a function.
+
+        @param      name        function name
+        @param      code        function code
+        @return                 function
+        """
+        loc = {}
+        obj = compile(code, "<{0}>".format(name), "exec")
+        exec(obj, self._globals, loc)  # pylint: disable=W0122
+        return loc[name]
+
+
+class CompiledColumns:
+
+    """
+    Compiles the evaluation of a list of columns from a row of the input table.
+    The generated function receives one row (a dictionary or a tuple)
+    and returns the output row or None if *condition* is not verified.
+
+    ::
+
+        tbl = IterRow(None, [{"nom": "j", "age": 10}])
+        comp = CompiledColumns([tbl.age * 2], tbl.Schema)
+        print(comp.Source)
+    """
+
+    def __init__(self, columns, inputs, condition=None, as_dict=True):
+        """
+        constructor
+
+        @param      columns     list of @see cl ColumnType to evaluate
+        @param      inputs      schema of the input table (list of @see cl ColumnType)
+        @param      condition   a condition (@see cl ColumnType) or None
+        @param      as_dict     the function returns a dictionary or a tuple
+        """
+        self._columns = list(columns)
+        self._inputs = list(inputs)
+        self._condition = condition
+        self._as_dict = as_dict
+        self._functions = {}
+        self._sources = {}
+
+    @property
+    def Source(self):
+        """
+        returns the code generated for dictionaries
+        """
+        self.function(True)
+        return self._sources[True]
+
+    def function(self, dict_rows):
+        """
+        Returns the compiled function.
+
+        @param      dict_rows       the input rows are dictionaries (True) or tuples (False)
+        @return                     function
+        """
+        if dict_rows not in self._functions:
+            comp = ExpressionCompiler()
+            code = self._generate(comp, dict_rows)
+            self._sources[dict_rows] = code
+            self._functions[dict_rows] = comp.compile("_compiled_", code)
+        return self._functions[dict_rows]
+
+    def _generate(self, comp, dict_rows):
+        """
+        Generates the code of the function.
+        """
+        inputs = {}
+        reads = []
+        for i, col in enumerate(self._inputs):
+            var = "_i{0}".format(i)
+            inputs[id(col)] = var
+            if dict_rows:
+                reads.append("{0} = row[{1}]".format(var, repr(col.Name)))
+            else:
+                reads.append("{0} = row[{1}]".format(var, i))
+
+        body = []
+        if self._condition is not None:
+            body.append("if not ({0}):".format(
+                comp.expression(self._condition, inputs)))
+            body.append("    return None")
+
+        exps = [comp.expression(col, inputs) for col in self._columns]
+        if self._as_dict:
+            items = ["{0}: {1}".format(repr(col.Name), exp)
+                     for col, exp in zip(self._columns, exps)]
+            body.append("return {{{0}}}".format(", ".join(items)))
+        else:
+            body.append("return ({0},)".format(", ".join(exps)))
+
+        # only the values used by the expressions are read
+        used = set(re.findall("_i[0-9]+", "\n".join(body)))
+        reads = [r for r in reads if r.split(" ")[0] in used]
+
+        message = comp.add_global(
+            "unable to evaluate the compiled expression:\n{0}", "_m")
+        code = ["def _compiled_(row):", "    try:"]
+        code.extend("        " + _ for _ in reads + body)
+        code.append("    except (TypeError, AttributeError) as e:")
+        code.append(
+            "        raise IterException({0}.format(_source_)) from e".format(message))
+        source = "\n".join(code)
+        comp.Globals["_source_"] = source
+        return source
+
+
+def distinct_expressions(columns, inputs):
+    """
+    Removes the duplicated expressions from a list of columns,
+    two expressions are equal if they produce the same code.
+
+    @param      columns     list of @see cl ColumnType
+    @param      inputs      schema of the input table (list of @see cl ColumnType)
+    @return                 list of distinct columns, position of every column in that list
+    """
+    comp = ExpressionCompiler()
+    names = {id(c): "_i{0}".format(i) for i, c in enumerate(inputs)}
+    codes = {}
+    unique = []
+    positions = []
+    for col in columns:
+        code = comp.expression(col, names)
+        if code not in codes:
+            codes[code] = len(unique)
+            unique.append(col)
+        positions.append(codes[code])
+    return unique, positions
+
+
+def compile_accumulators(operators, positions):
+    """
+    Generates the functions which initialize and update
+    the accumulators of a group (see @see cl ColumnGroupOperator)
+    in a single call for all aggregated columns.
+
+    @param      operators       list of @see cl ColumnGroupOperator
+    @param      positions       position of the value every operator receives
+    @return                     function ``init()`` which returns the list of states,
+                                function ``update(states, values)``
+    """
+    comp = ExpressionCompiler()
+    inits = [comp.add_global(op.init, "_init") for op in operators]
+    upds = [comp.add_global(op.update, "_upd") for op in operators]
+    code = ["def _init_():",
+            "    return [{0}]".format(", ".join(_ + "()" for _ in inits)),
+            "",
+            "def _update_(states, values):"]
+    for i, (upd, pos) in enumerate(zip(upds, positions)):
+        code.append("    states[{0}] = {1}(states[{0}], values[{2}])".format(
+            i, upd, pos))
+    if not operators:
+        code.append("    pass")
+    code = "\n".join(code)
+    return comp.compile("_init_", code), comp.compile("_update_", code)
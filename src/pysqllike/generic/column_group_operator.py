@@ -4,13 +4,25 @@
 @brief Creates custom classes to interpret Python expression as column operations.
 """
 
+from math import sqrt
 from .column_operator import ColumnOperator
-from .others_types import NA
+from .others_types import NA, GroupByContainer
 
 
 class ColumnGroupOperator(ColumnOperator):
     """
     Defines an operation between two columns.
+
+    An aggregation is computed with an accumulator,
+    the groupby calls @see me init for every new group,
+    @see me update for every row of the group,
+    @see me finalize once the group is complete.
+    @see me merge combines two partial aggregations (partitions, processes).
+    @see me remove is used by sliding windows (see @see cl OperatorWindowAggregate),
+    an accumulator which does not implement it is computed again on the whole frame.
+    The default implementation keeps every value in a list
+    and calls the operator on it, a subclass can overload these four
+    methods to aggregate in constant memory.
     """
 
     def __init__(self):
@@ -33,6 +45,68 @@ class ColumnGroupOperator(ColumnOperator):
         """
         raise NotImplementedError()
 
+    def init(self):
+        """
+        returns the initial state of the accumulator (empty group)
+        """
+        return []
+
+    def update(self, state, value):
+        """
+        adds a value to the accumulator
+
+        @param      state       current state
+        @param      value       new value
+        @return                 new state
+        """
+        state.append(value)
+        return state
+
+    def merge(self, state, other):
+        """
+        merges two accumulators
+
+        @param      state       first state
+        @param      other       second state
+        @return                 merged state
+        """
+        return state + other
+
+    def remove(self, state, value):
+        """
+        removes the oldest value added to the accumulator
+
+        @param      state       current state
+        @param      value       oldest value
+        @return                 new state
+        """
+        del state[0]
+        return state
+
+    def finalize(self, state):
+        """
+        returns the aggregated value
+
+        @param      state       final state
+        @return                 value
+        """
+        return self(GroupByContainer(state))
+
+    def accumulate(self, columns):
+        """
+        aggregates a list of values with the accumulator
+
+        @param      columns     iterator on values
+        @return                 aggregated value
+        """
+        if not hasattr(columns, '__iter__'):
+            raise TypeError(
+                "we expect an iterator here not " + str(type(columns)))
+        state = self.init()
+        for val in columns:
+            state = self.update(state, val)
+        return self.finalize(state)
+
 
 class OperatorGroupLen(ColumnGroupOperator):
 
@@ -55,6 +129,36 @@ class OperatorGroupLen(ColumnGroupOperator):
                 "we expect an iterator here not " + str(type(columns)))
         return len(columns)
 
+    def init(self):
+        """
+        the state is the number of observations
+        """
+        return 0
+
+    def update(self, state, value):
+        """
+        adds a value to the accumulator
+        """
+        return state + 1
+
+    def merge(self, state, other):
+        """
+        merges two accumulators
+        """
+        return state + other
+
+    def remove(self, state, value):
+        """
+        removes the oldest value
+        """
+        return state - 1
+
+    def finalize(self, state):
+        """
+        returns the aggregated value
+        """
+        return state
+
 
 class OperatorGroupAvg(ColumnGroupOperator):
 
@@ -87,6 +191,408 @@ class OperatorGroupAvg(ColumnGroupOperator):
             nb += 1
 
         if nb == 0:
-            return NA
+            return NA()
         else:
             return s / nb
+
+    def init(self):
+        """
+        the state is a list ``[number of observations, sum]``
+        """
+        return [0, None]
+
+    def update(self, state, value):
+        """
+        adds a value to the accumulator
+        """
+        if state[0] == 0:
+            state[1] = value
+        else:
+            state[1] += value
+        state[0] += 1
+        return state
+
+    def merge(self, state, other):
+        """
+        merges two accumulators
+        """
+        if state[0] == 0:
+            return list(other)
+        if other[0] == 0:
+            return state
+        return [state[0] + other[0], state[1] + other[1]]
+
+    def remove(self, state, value):
+        """
+        removes the oldest value
+        """
+        state[0] -= 1
+        state[1] = None if state[0] == 0 else state[1] - value
+        return state
+
+    def finalize(self, state):
+        """
+        returns the aggregated value, @see cl NA for a null set
+        """
+        if state[0] == 0:
+            return NA()
+        return state[1] / state[0]
+
+
+class OperatorGroupSum(ColumnGroupOperator):
+
+    """
+    defines the group function ``sum``, the value for an empty set is @see cl NA
+    """
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "sum"
+
+    def __call__(self, columns):
+        """
+        returns the results of this operation between a list of columns
+        """
+        return self.accumulate(columns)
+
+    def init(self):
+        """
+        the state is the sum or None for an empty set
+        """
+        return None
+
+    def update(self, state, value):
+        """
+        adds a value to the accumulator
+        """
+        return value if state is None else state + value
+
+    def merge(self, state, other):
+        """
+        merges two accumulators
+        """
+        if state is None:
+            return other
+        if other is None:
+            return state
+        return state + other
+
+    def remove(self, state, value):
+        """
+        removes the oldest value, the frame of a window is never empty
+        after a value was removed
+        """
+        return state - value
+
+    def finalize(self, state):
+        """
+        returns the aggregated value
+        """
+        return NA() if state is None else state
+
+
+class OperatorGroupMin(OperatorGroupSum):
+
+    """
+    defines the group function ``min``, the value for an empty set is @see cl NA
+    """
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "min"
+
+    def update(self, state, value):
+        """
+        adds a value to the accumulator
+        """
+        return value if state is None or value < state else state
+
+    def merge(self, state, other):
+        """
+        merges two accumulators
+        """
+        return state if other is None else self.update(state, other)
+
+    def remove(self, state, value):
+        """
+        not possible, the minimum cannot be updated without the other values
+        """
+        raise NotImplementedError()
+
+
+class OperatorGroupMax(OperatorGroupSum):
+
+    """
+    defines the group function ``max``, the value for an empty set is @see cl NA
+    """
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "max"
+
+    def update(self, state, value):
+        """
+        adds a value to the accumulator
+        """
+        return value if state is None or value > state else state
+
+    def merge(self, state, other):
+        """
+        merges two accumulators
+        """
+        return state if other is None else self.update(state, other)
+
+    def remove(self, state, value):
+        """
+        not possible, the maximum cannot be updated without the other values
+        """
+        raise NotImplementedError()
+
+
+class OperatorGroupVar(ColumnGroupOperator):
+
+    """
+    defines the group function ``var``, the variance is computed
+    in a single pass with Welford's algorithm (numerically stable),
+    partial results are merged with Chan's formula
+    """
+
+    def __init__(self, unbiased=True):
+        """
+        constructor
+
+        @param      unbiased    divides by *n-1* (sample variance) or by *n*
+        """
+        ColumnGroupOperator.__init__(self)
+        self._unbiased = unbiased
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "var"
+
+    def __call__(self, columns):
+        """
+        returns the results of this operation between a list of columns
+        """
+        return self.accumulate(columns)
+
+    def init(self):
+        """
+        the state is a list ``[number of observations, mean, sum of squared deviations]``
+        """
+        return [0, 0., 0.]
+
+    def update(self, state, value):
+        """
+        adds a value to the accumulator
+        """
+        state[0] += 1
+        delta = value - state[1]
+        state[1] += delta / state[0]
+        state[2] += delta * (value - state[1])
+        return state
+
+    def merge(self, state, other):
+        """
+        merges two accumulators
+        """
+        if state[0] == 0:
+            return list(other)
+        if other[0] == 0:
+            return state
+        nb = state[0] + other[0]
+        delta = other[1] - state[1]
+        mean = state[1] + delta * other[0] / nb
+        m2 = state[2] + other[2] + delta ** 2 * state[0] * other[0] / nb
+        return [nb, mean, m2]
+
+    def remove(self, state, value):
+        """
+        removes the oldest value (Welford's update in reverse)
+        """
+        if state[0] <= 1:
+            return self.init()
+        mean = (state[0] * state[1] - value) / (state[0] - 1)
+        state[2] -= (value - state[1]) * (value - mean)
+        state[0] -= 1
+        state[1] = mean
+        return state
+
+    def finalize(self, state):
+        """
+        returns the aggregated value, @see cl NA if there are not enough observations
+        """
+        nb = state[0] - 1 if self._unbiased else state[0]
+        if nb <= 0:
+            return NA()
+        return state[2] / nb
+
+
+class OperatorGroupStd(OperatorGroupVar):
+
+    """
+    defines the group function ``std``, square root of @see cl OperatorGroupVar
+    """
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "std"
+
+    def finalize(self, state):
+        """
+        returns the aggregated value, @see cl NA if there are not enough observations
+        """
+        var = OperatorGroupVar.finalize(self, state)
+        return var if isinstance(var, NA) else sqrt(var)
+
+
+class OperatorGroupFirst(ColumnGroupOperator):
+
+    """
+    defines the group function ``first``, the value for an empty set is @see cl NA
+    """
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "first"
+
+    def __call__(self, columns):
+        """
+        returns the results of this operation between a list of columns
+        """
+        return self.accumulate(columns)
+
+    def init(self):
+        """
+        the state is a list ``[number of observations, value]``
+        """
+        return [0, None]
+
+    def update(self, state, value):
+        """
+        adds a value to the accumulator
+        """
+        if state[0] == 0:
+            state[1] = value
+        state[0] += 1
+        return state
+
+    def merge(self, state, other):
+        """
+        merges two accumulators, *state* comes before *other*
+        """
+        if state[0] == 0:
+            return list(other)
+        return [state[0] + other[0], state[1]]
+
+    def remove(self, state, value):
+        """
+        not possible, the state does not keep the following values
+        """
+        raise NotImplementedError()
+
+    def finalize(self, state):
+        """
+        returns the aggregated value
+        """
+        return NA() if state[0] == 0 else state[1]
+
+
+class OperatorGroupLast(OperatorGroupFirst):
+
+    """
+    defines the group function ``last``, the value for an empty set is @see cl NA
+    """
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "last"
+
+    def update(self, state, value):
+        """
+        adds a value to the accumulator
+        """
+        state[1] = value
+        state[0] += 1
+        return state
+
+    def merge(self, state, other):
+        """
+        merges two accumulators, *state* comes before *other*
+        """
+        if other[0] == 0:
+            return state
+        return [state[0] + other[0], other[1]]
+
+    def remove(self, state, value):
+        """
+        removes the oldest value, the last one does not change
+        """
+        state[0] -= 1
+        if state[0] == 0:
+            state[1] = None
+        return state
+
+
+class OperatorGroupCountDistinct(ColumnGroupOperator):
+
+    """
+    defines the group function ``count_distinct`` (exact)
+    """
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "count_distinct"
+
+    def __call__(self, columns):
+        """
+        returns the results of this operation between a list of columns
+        """
+        return self.accumulate(columns)
+
+    def init(self):
+        """
+        the state is the set of distinct values
+        """
+        return set()
+
+    def update(self, state, value):
+        """
+        adds a value to the accumulator
+        """
+        state.add(value)
+        return state
+
+    def merge(self, state, other):
+        """
+        merges two accumulators
+        """
+        return state | other
+
+    def remove(self, state, value):
+        """
+        not possible, the state does not count the values
+        """
+        raise NotImplementedError()
+
+    def finalize(self, state):
+        """
+        returns the aggregated value
+        """
+        return len(state)
@@ -3,6 +3,70 @@
 @file
 @brief Creates custom classes to interpret Python expression as column operations.
 """
+import operator
+from functools import reduce
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+def _batch_reduce(op, args):
+    """
+    applies a binary operator on batches of values, left to right
+    """
+    return reduce(lambda a, b: list(map(op, a, b)), args[1:], list(args[0]))
+
+
+def _numpy_batch(args, kinds="iuf"):
+    """
+    tells if the batches can be processed with :epkg:`numpy`,
+    every batch must be an array of numbers (or booleans if *kinds* is ``"b"``),
+    numbers exclude booleans, :epkg:`numpy` does not follow Python
+    for arithmetic on booleans (``True + True`` is ``True``)
+    """
+    if numpy is None:
+        return False
+    for a in args:
+        if not isinstance(a, numpy.ndarray) or a.dtype.kind not in kinds:
+            return False
+    return True
+
+
+def _python_batch(args):
+    """
+    converts :epkg:`numpy` arrays into lists before
+    an operator is applied with Python semantic
+    """
+    if numpy is None:
+        return args
+    return [a.tolist() if isinstance(a, numpy.ndarray) else a for a in args]
+
+
+def _numpy_exact(op, args):
+    """
+    applies an operator on :epkg:`numpy` arrays and returns None
+    if the result may have overflowed: :epkg:`numpy` integers have a fixed size,
+    the operation is computed again with floats and the result must stay
+    far enough from the integer limits, the caller then uses Python integers
+    """
+    res = op(*args)
+    if res.dtype.kind not in "iu":
+        return res
+    info = numpy.iinfo(res.dtype)
+    with numpy.errstate(over="ignore", invalid="ignore"):
+        approx = op(*[a.astype(numpy.float64) for a in args])
+        if not ((approx >= info.min / 2) & (approx <= info.max / 2)).all():
+            return None
+    return res
+
+
+def _numpy_divisible(args):
+    """
+    tells if a division can be processed with :epkg:`numpy`,
+    a null divisor must raise an exception as Python does
+    """
+    return _numpy_batch(args) and not (args[1] == 0).any()
 
 
 class ColumnOperator:
@@ -31,6 +95,26 @@ class ColumnOperator:
         """
         raise NotImplementedError()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation,
+        it is used by @see cl ExpressionCompiler
+
+        @param      args        list of strings (code of every operand)
+        @return                 string
+        """
+        raise NotImplementedError()
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it is used by @see cl BatchExecutor
+
+        @param      args        list of batches (one list of values per operand)
+        @return                 list of values
+        """
+        raise NotImplementedError()
+
 
 class OperatorId(ColumnOperator):
 
@@ -58,6 +142,18 @@ class OperatorId(ColumnOperator):
             c.IsColumnType()
         return columns[0]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return args[0]
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values
+        """
+        return args[0]
+
 
 class OperatorMul(ColumnOperator):
 
@@ -89,6 +185,23 @@ class OperatorMul(ColumnOperator):
             r *= c()
         return r
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "(" + " * ".join(args) + ")"
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_batch(args):
+            res = _numpy_exact(lambda *a: reduce(operator.mul, a), args)
+            if res is not None:
+                return res
+        return _batch_reduce(operator.mul, _python_batch(args))
+
 
 class OperatorAdd(ColumnOperator):
 
@@ -120,6 +233,23 @@ class OperatorAdd(ColumnOperator):
             r += c()
         return r
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "(" + " + ".join(args) + ")"
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_batch(args):
+            res = _numpy_exact(lambda *a: reduce(operator.add, a), args)
+            if res is not None:
+                return res
+        return _batch_reduce(operator.add, _python_batch(args))
+
 
 class OperatorDiv(ColumnOperator):
 
@@ -147,6 +277,21 @@ class OperatorDiv(ColumnOperator):
             c.IsColumnType()
         return columns[0]() / columns[1]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "({0} / {1})".format(*args)
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_divisible(args):
+            return operator.truediv(*args)
+        return list(map(operator.truediv, *_python_batch(args)))
+
 
 class OperatorSub(ColumnOperator):
 
@@ -174,6 +319,23 @@ class OperatorSub(ColumnOperator):
             c.IsColumnType()
         return columns[0]() - columns[1]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "({0} - {1})".format(*args)
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_batch(args):
+            res = _numpy_exact(operator.sub, args)
+            if res is not None:
+                return res
+        return list(map(operator.sub, *_python_batch(args)))
+
 
 class OperatorPow(ColumnOperator):
 
@@ -202,6 +364,23 @@ class OperatorPow(ColumnOperator):
 
         return columns[0]() ** columns[1]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "({0} ** {1})".format(*args)
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_batch(args) and (args[1].dtype.kind == "f" or (args[1] >= 0).all()):
+            res = _numpy_exact(operator.pow, args)
+            if res is not None:
+                return res
+        return list(map(operator.pow, *_python_batch(args)))
+
 
 class OperatorMod(ColumnOperator):
 
@@ -230,6 +409,21 @@ class OperatorMod(ColumnOperator):
 
         return columns[0]() % columns[1]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "({0} % {1})".format(*args)
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_divisible(args):
+            return operator.mod(*args)
+        return list(map(operator.mod, *_python_batch(args)))
+
 
 class OperatorDivN(ColumnOperator):
 
@@ -258,6 +452,21 @@ class OperatorDivN(ColumnOperator):
 
         return columns[0]() // columns[1]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "({0} // {1})".format(*args)
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_divisible(args):
+            return operator.floordiv(*args)
+        return list(map(operator.floordiv, *_python_batch(args)))
+
 
 class OperatorEq(ColumnOperator):
 
@@ -285,6 +494,21 @@ class OperatorEq(ColumnOperator):
             c.IsColumnType()
         return columns[0]() == columns[1]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "({0} == {1})".format(*args)
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_batch(args):
+            return operator.eq(*args)
+        return list(map(operator.eq, *_python_batch(args)))
+
 
 class OperatorNe(ColumnOperator):
 
@@ -312,6 +536,21 @@ class OperatorNe(ColumnOperator):
             c.IsColumnType()
         return columns[0]() != columns[1]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "({0} != {1})".format(*args)
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_batch(args):
+            return operator.ne(*args)
+        return list(map(operator.ne, *_python_batch(args)))
+
 
 class OperatorLt(ColumnOperator):
 
@@ -339,6 +578,21 @@ class OperatorLt(ColumnOperator):
             c.IsColumnType()
         return columns[0]() < columns[1]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "({0} < {1})".format(*args)
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_batch(args):
+            return operator.lt(*args)
+        return list(map(operator.lt, *_python_batch(args)))
+
 
 class OperatorGt(ColumnOperator):
 
@@ -366,6 +620,21 @@ class OperatorGt(ColumnOperator):
             c.IsColumnType()
         return columns[0]() > columns[1]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "({0} > {1})".format(*args)
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_batch(args):
+            return operator.gt(*args)
+        return list(map(operator.gt, *_python_batch(args)))
+
 
 class OperatorLe(ColumnOperator):
 
@@ -393,6 +662,21 @@ class OperatorLe(ColumnOperator):
             c.IsColumnType()
         return columns[0]() <= columns[1]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "({0} <= {1})".format(*args)
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_batch(args):
+            return operator.le(*args)
+        return list(map(operator.le, *_python_batch(args)))
+
 
 class OperatorGe(ColumnOperator):
 
@@ -420,6 +704,21 @@ class OperatorGe(ColumnOperator):
             c.IsColumnType()
         return columns[0]() >= columns[1]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "({0} >= {1})".format(*args)
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_batch(args):
+            return operator.ge(*args)
+        return list(map(operator.ge, *_python_batch(args)))
+
 
 class OperatorOr(ColumnOperator):
 
@@ -447,6 +746,21 @@ class OperatorOr(ColumnOperator):
             c.IsColumnType()
         return columns[0]() or columns[1]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "({0} or {1})".format(*args)
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_batch(args, "b"):
+            return numpy.logical_or(*args)
+        return [a or b for a, b in zip(*_python_batch(args))]
+
 
 class OperatorAnd(ColumnOperator):
 
@@ -474,6 +788,21 @@ class OperatorAnd(ColumnOperator):
             c.IsColumnType()
         return columns[0]() and columns[1]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "({0} and {1})".format(*args)
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_batch(args, "b"):
+            return numpy.logical_and(*args)
+        return [a and b for a, b in zip(*_python_batch(args))]
+
 
 class OperatorNot(ColumnOperator):
 
@@ -501,6 +830,21 @@ class OperatorNot(ColumnOperator):
             c.IsColumnType()
         return not columns[0]()
 
+    def code(self, args):
+        """
+        returns the Python code equivalent to this operation
+        """
+        return "(not {0})".format(*args)
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values,
+        it relies on :epkg:`numpy` if the batches are arrays
+        """
+        if _numpy_batch(args, "b"):
+            return numpy.logical_not(*args)
+        return [not a for a in _python_batch(args)[0]]
+
 
 class OperatorFunc(ColumnOperator):
 
@@ -529,3 +873,9 @@ class OperatorFunc(ColumnOperator):
         for c in columns:
             c.IsColumnType()
         return self._func(* [c() for c in columns])
+
+    def batch(self, args):
+        """
+        returns the results of this operation on batches of values
+        """
+        return list(map(self._func, *args))
@@ -13,7 +13,12 @@ from .column_operator import OperatorEq, OperatorNe, OperatorGe, OperatorLe, Ope
 from .column_operator import OperatorNot, OperatorOr, OperatorAnd
 from .column_operator import OperatorFunc
 
-from .column_group_operator import OperatorGroupLen, OperatorGroupAvg
+from .column_group_operator import OperatorGroupLen, OperatorGroupAvg, OperatorGroupSum
+from .column_group_operator import OperatorGroupMin, OperatorGroupMax, OperatorGroupVar
+from .column_group_operator import OperatorGroupStd, OperatorGroupFirst, OperatorGroupLast
+from .column_group_operator import OperatorGroupCountDistinct
+from .column_window_operator import OperatorWindowAggregate, OperatorWindowLag
+from .column_window_operator import OperatorWindowRowNumber, OperatorWindowRank
 
 
 def private_function_type():
@@ -545,6 +550,105 @@ class ColumnType:
         return ColumnGroupType(
             ColumnType._default_name, float, parent=(self,), op=OperatorGroupAvg())
 
+    def sum(self):
+        """
+        returns a group columns to return a sum
+        """
+        return ColumnGroupType(
+            ColumnType._default_name, self._type, parent=(self,), op=OperatorGroupSum())
+
+    def min(self):
+        """
+        returns a group columns to return the minimum
+        """
+        return ColumnGroupType(
+            ColumnType._default_name, self._type, parent=(self,), op=OperatorGroupMin())
+
+    def max(self):
+        """
+        returns a group columns to return the maximum
+        """
+        return ColumnGroupType(
+            ColumnType._default_name, self._type, parent=(self,), op=OperatorGroupMax())
+
+    def var(self, unbiased=True):
+        """
+        returns a group columns to return the variance
+
+        @param      unbiased    divides by *n-1* (sample variance) or by *n*
+        """
+        return ColumnGroupType(
+            ColumnType._default_name, float, parent=(self,), op=OperatorGroupVar(unbiased))
+
+    def std(self, unbiased=True):
+        """
+        returns a group columns to return the standard deviation
+
+        @param      unbiased    divides by *n-1* (sample variance) or by *n*
+        """
+        return ColumnGroupType(
+            ColumnType._default_name, float, parent=(self,), op=OperatorGroupStd(unbiased))
+
+    def first(self):
+        """
+        returns a group columns to return the first value of a group
+        """
+        return ColumnGroupType(
+            ColumnType._default_name, self._type, parent=(self,), op=OperatorGroupFirst())
+
+    def last(self):
+        """
+        returns a group columns to return the last value of a group
+        """
+        return ColumnGroupType(
+            ColumnType._default_name, self._type, parent=(self,), op=OperatorGroupLast())
+
+    def count_distinct(self):
+        """
+        returns a group columns to count the number of distinct values
+        """
+        return ColumnGroupType(
+            ColumnType._default_name, int, parent=(self,), op=OperatorGroupCountDistinct())
+
+    def cumsum(self):
+        """
+        returns a window column to return the sum of all previous rows
+        (see @see me window)
+        """
+        return ColumnWindowType(
+            ColumnType._default_name, self._type, parent=(self,),
+            op=OperatorWindowAggregate(OperatorGroupSum()))
+
+    def lag(self, n=1, default=None):
+        """
+        returns a window column to return the value of the *n*-th previous row
+        (see @see me window)
+
+        @param      n           offset
+        @param      default     value when there is no such row (None for @see cl NA)
+        """
+        return ColumnWindowType(
+            ColumnType._default_name, self._type, parent=(self,),
+            op=OperatorWindowLag(n, default))
+
+    def row_number(self):
+        """
+        returns a window column to return the position of the row in its partition
+        (see @see me window), the column value is not used
+        """
+        return ColumnWindowType(
+            ColumnType._default_name, int, parent=(self,), op=OperatorWindowRowNumber())
+
+    def rank(self, dense=False):
+        """
+        returns a window column to return the rank of the row in its partition
+        (see @see me window), the column value is not used
+
+        @param      dense       no gap after rows sharing the same rank
+        """
+        return ColumnWindowType(
+            ColumnType._default_name, int, parent=(self,), op=OperatorWindowRank(dense))
+
 
 class ColumnConstantType(ColumnType):
 
@@ -719,6 +823,18 @@ class ColumnGroupType(ColumnType):
         """
         return "CGT[{0}]({1})".format(str(self._opgr), self._name)
 
+    def over(self, preceding=None):
+        """
+        returns a window column which computes this aggregation
+        on a frame ending with the current row (see @see me window)
+
+        @param      preceding   number of previous rows in the frame, None for all of them
+        @return                 @see cl ColumnWindowType
+        """
+        return ColumnWindowType(
+            self._name, self._type, parent=self._parent,
+            op=OperatorWindowAggregate(self._opgr, preceding))
+
     def set(self, value):
         """
         sets a value for this column
@@ -777,6 +893,67 @@ class ColumnGroupType(ColumnType):
         raise NotAllowedOperation()
 
 
+class ColumnWindowType(ColumnType):
+
+    """
+    defines a column which processes the sorted rows of a partition (see @see me window)
+    """
+
+    def __init__(self, name, typ, parent, op):
+        """
+        constructor
+
+        @param      name        name of the column
+        @param      typ         type of the column
+        @param      parent      the column the window function receives
+        @param      op          @see cl ColumnWindowOperator
+        """
+        self._name = name
+        self._value = None
+        self._parent = parent
+        self._opwin = op
+        self._op = OperatorId()
+        self._type = typ
+        self._owner = None
+        self._func = None
+
+    @property
+    def ShortName(self):
+        """
+        a short name (tells the column type)
+        """
+        return "window"
+
+    def set_none(self):
+        """
+        after a loop on a database, we should put None back as a value
+        """
+        self._value = None
+
+    def set(self, value):
+        """
+        sets a value for this column
+
+        @param      value       anything
+        """
+        self._value = value
+
+    def __call__(self):
+        """
+        returns the value computed by @see me window
+        """
+        if self._value is None:
+            raise IterException(
+                "a window column can only be evaluated by IterRow.window: {0}".format(self))
+        return self._value
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "CWT[{0}]({1})".format(str(self._opwin), self._name)
+
+
 class CFT(ColumnType):
 
     """
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+@file
+@brief Defines the window functions (see @see me window).
+"""
+from collections import deque
+from .column_operator import ColumnOperator
+from .others_types import NA
+
+
+class ColumnWindowOperator(ColumnOperator):
+    """
+    Defines a window function.
+
+    @see me window sorts the rows of a table by partition and order,
+    every partition is processed row after row:
+    the function calls @see me start for every new partition and
+    @see me step for every row of the partition, the result of *step*
+    is the value of the window column for this row.
+    """
+
+    def __init__(self):
+        """
+        Initiates the operator.
+        """
+        pass
+
+    def __str__(self):
+        """
+        usual
+        """
+        raise NotImplementedError()
+
+    def __call__(self, columns):
+        """
+        a window function cannot be evaluated outside @see me window
+        """
+        raise NotImplementedError(
+            "a window function can only be used by IterRow.window")
+
+    def start(self):
+        """
+        returns the initial state for a new partition
+        """
+        raise NotImplementedError()
+
+    def step(self, state, value, key):
+        """
+        processes one row of a partition
+
+        @param      state       current state (modified by the function)
+        @param      value       value received by the window column for this row
+        @param      key         values of the columns the partition is sorted by (tuple)
+        @return                 value of the window column for this row
+        """
+        raise NotImplementedError()
+
+
+class OperatorWindowAggregate(ColumnWindowOperator):
+
+    """
+    Computes an aggregation (see @see cl ColumnGroupOperator)
+    on a frame which ends with the current row: all the previous rows
+    of the partition (``ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW``)
+    or the *preceding* previous rows (``ROWS BETWEEN n PRECEDING AND CURRENT ROW``).
+    The accumulator is updated with every new row, the value which leaves
+    the frame is removed with @see me remove if the accumulator implements it,
+    otherwise the aggregation is computed again on the frame.
+    """
+
+    def __init__(self, opgr, preceding=None):
+        """
+        constructor
+
+        @param      opgr        @see cl ColumnGroupOperator
+        @param      preceding   number of previous rows in the frame, None for all
+        """
+        ColumnWindowOperator.__init__(self)
+        if preceding is not None and preceding < 0:
+            raise ValueError("preceding must be positive")
+        self._opgr = opgr
+        self._preceding = preceding
+
+    def __str__(self):
+        """
+        usual
+        """
+        if self._preceding is None:
+            return "{0} over rows".format(self._opgr)
+        return "{0} over {1} rows".format(self._opgr, self._preceding)
+
+    def start(self):
+        """
+        the state is a list ``[accumulator, frame, remove is implemented]``
+        """
+        frame = None if self._preceding is None else deque()
+        return [self._opgr.init(), frame, True]
+
+    def step(self, state, value, key):
+        """
+        adds the current row to the frame and returns the aggregated value
+        """
+        op = self._opgr
+        state[0] = op.update(state[0], value)
+        frame = state[1]
+        if frame is not None:
+            frame.append(value)
+            if len(frame) > self._preceding + 1:
+                oldest = frame.popleft()
+                if state[2]:
+                    try:
+                        state[0] = op.remove(state[0], oldest)
+                    except NotImplementedError:
+                        state[2] = False
+                if not state[2]:
+                    acc = op.init()
+                    for v in frame:
+                        acc = op.update(acc, v)
+                    state[0] = acc
+        return op.finalize(state[0])
+
+
+class OperatorWindowLag(ColumnWindowOperator):
+
+    """
+    defines the window function ``lag``, the value of the *n*-th previous row
+    """
+
+    def __init__(self, n=1, default=None):
+        """
+        constructor
+
+        @param      n           offset
+        @param      default     value when there is no such row (None for @see cl NA)
+        """
+        ColumnWindowOperator.__init__(self)
+        if n < 1:
+            raise ValueError("n must be strictly positive")
+        self._n = n
+        self._default = default
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "lag({0})".format(self._n)
+
+    def start(self):
+        """
+        the state holds the last *n* values
+        """
+        return deque(maxlen=self._n)
+
+    def step(self, state, value, key):
+        """
+        returns the value of the *n*-th previous row
+        """
+        if len(state) < self._n:
+            res = NA() if self._default is None else self._default
+        else:
+            res = state[0]
+        state.append(value)
+        return res
+
+
+class OperatorWindowRowNumber(ColumnWindowOperator):
+
+    """
+    defines the window function ``row_number`` (starts at 1)
+    """
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "row_number"
+
+    def start(self):
+        """
+        the state is the number of rows
+        """
+        return [0]
+
+    def step(self, state, value, key):
+        """
+        returns the position of the row in the partition
+        """
+        state[0] += 1
+        return state[0]
+
+
+class OperatorWindowRank(ColumnWindowOperator):
+
+    """
+    defines the window function ``rank``, rows sharing the same order key
+    receive the same rank, the next rank skips as many values
+    (or does not if *dense* is True)
+    """
+
+    def __init__(self, dense=False):
+        """
+        constructor
+
+        @param      dense       ``dense_rank`` instead of ``rank``
+        """
+        ColumnWindowOperator.__init__(self)
+        self._dense = dense
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "dense_rank" if self._dense else "rank"
+
+    def start(self):
+        """
+        the state is a list ``[number of rows, rank, previous key]``
+        """
+        return [0, 0, None]
+
+    def step(self, state, value, key):
+        """
+        returns the rank of the row in the partition
+        """
+        state[0] += 1
+        if state[0] == 1 or key != state[2]:
+            state[1] = state[1] + 1 if self._dense else state[0]
+            state[2] = key
+        return state[1]
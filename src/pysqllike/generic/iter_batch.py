@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+@file
+@brief Executes a chain of operations on @see cl IterRow with batches of rows.
+"""
+from itertools import compress
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+from .iter_exceptions import IterException
+from .column_operator import ColumnOperator
+from .column_type import ColumnType, ColumnConstantType, ColumnGroupType, ColumnWindowType
+from .column_compiler import distinct_expressions
+from .others_types import NA
+
+
+def batch_length(batch):
+    """
+    returns the number of rows in a batch
+
+    @param      batch       dictionary ``{ column name: list of values }``
+    @return                 int
+    """
+    for v in batch.values():
+        return len(v)
+    return 0
+
+
+def batch_column_tolist(values):
+    """
+    converts a column of a batch into a list
+
+    @param      values      list or :epkg:`numpy` array
+    @return                 list
+    """
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        return values.tolist()
+    return values
+
+
+def batch_compress(values, mask):
+    """
+    keeps the values whose mask is true
+
+    @param      values      list or :epkg:`numpy` array
+    @param      mask        list or :epkg:`numpy` array
+    @return                 list or :epkg:`numpy` array
+    """
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        return values[numpy.asarray(mask, dtype=bool)]
+    return list(compress(values, mask))
+
+
+def batch_to_rows(batch, names, as_dict=True):
+    """
+    converts a batch into rows
+
+    @param      batch       dictionary ``{ column name: list of values }``
+    @param      names       column names
+    @param      as_dict     returns dictionaries or tuples
+    @return                 iterator on rows
+    """
+    cols = [batch_column_tolist(batch[n]) for n in names]
+    if as_dict:
+        for values in zip(*cols):
+            yield dict(zip(names, values))
+    else:
+        yield from zip(*cols)
+
+
+class BatchExecutor:
+
+    """
+    Reads the operations stored in @see me Plan of every
+    @see cl IterRow and processes the rows by batches:
+    every operator receives a dictionary ``{ column name: list of values }``
+    holding *batch_size* rows and produces another one.
+    Every operator of an expression (see @see cl ColumnOperator)
+    processes a whole column at once with its method ``batch``,
+    the interpretation cost is paid once per batch and not once per row.
+    Operators select, where, groupby and unionall are executed
+    by batches, the others are read through their own iterator.
+    If *use_numpy* is True, numerical columns are stored in
+    :epkg:`numpy` arrays and the operators use vectorized kernels,
+    a condition becomes a boolean mask. :epkg:`numpy` integers have
+    a fixed size, an operation whose result may overflow is computed
+    with Python integers.
+
+    ::
+
+        tbl = IterRow(None, [{"nom": "j", "age": 10}])
+        iter = tbl.select(tbl.nom, age2=tbl.age * 2)
+        for batch in BatchExecutor(iter, batch_size=1000):
+            print(batch["age2"])
+    """
+
+    _supported = {"select", "where", "groupby", "unionall"}
+
+    def __init__(self, node, batch_size=1000, use_numpy=False):
+        """
+        constructor
+
+        @param      node            @see cl IterRow, the last table of the chain
+        @param      batch_size      number of rows in a batch
+        @param      use_numpy       stores numerical columns into :epkg:`numpy` arrays,
+                                    None to use :epkg:`numpy` if it is installed
+        """
+        if batch_size <= 0:
+            raise ValueError("batch_size must be strictly positive")
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        elif use_numpy and numpy is None:
+            raise ImportError("numpy is not installed")
+        self._node = node
+        self._batch_size = batch_size
+        self._use_numpy = use_numpy
+
+    def __iter__(self):
+        """
+        iterates on batches
+        """
+        return self.iter_batches(self._node)
+
+    def evaluate(self, column, inputs, size):
+        """
+        Evaluates an expression on a batch.
+
+        @param      column      @see cl ColumnType
+        @param      inputs      dictionary ``{ id(column): list of values }``
+        @param      size        number of rows in the batch
+        @return                 list of values
+        """
+        key = id(column)
+        if key in inputs:
+            return inputs[key]
+        if isinstance(column, ColumnConstantType):
+            if self._use_numpy and isinstance(column._const, (int, float)):
+                try:
+                    return numpy.full(size, column._const)
+                except OverflowError:
+                    pass
+            return [column._const] * size
+        if not isinstance(column, ColumnType) or \
+                isinstance(column, (ColumnGroupType, ColumnWindowType)) or \
+                column._func is not None or \
+                not isinstance(column._op, ColumnOperator) or \
+                not column._parent:
+            raise IterException(
+                "unable to evaluate column {0} in batch mode".format(column))
+        args = [self.evaluate(p, inputs, size) for p in column._parent]
+        try:
+            return column._op.batch(args)
+        except NotImplementedError as e:
+            raise IterException(
+                "operator {0} has no batch implementation".format(column._op)) from e
+        except (TypeError, AttributeError) as e:
+            raise IterException(
+                "unable to apply operator {0} for column {1}".format(
+                    column._op, column)) from e
+
+    def iter_batches(self, node):
+        """
+        Iterates on the batches produced by a table.
+
+        @param      node        @see cl IterRow
+        @return                 iterator on dictionaries ``{ column name: list of values }``
+        """
+        plan = node.Plan
+        if plan is None or plan["op"] not in BatchExecutor._supported or \
+                plan.get("having") is not None or plan.get("memory_limit") is not None or \
+                plan.get("n_jobs") is not None:
+            return self._batch_source(node)
+        meth = getattr(self, "_batch_" + plan["op"])
+        return meth(node, plan)
+
+    def _inputs(self, node, batch):
+        """
+        maps every column of a table to its values
+        """
+        return {id(c): batch[c.Name] for c in node.Schema}
+
+    def _split(self, columns, names):
+        """
+        splits columns into batches of *batch_size* rows
+        """
+        size = len(columns[0]) if columns else 0
+        for i in range(0, size, self._batch_size):
+            yield {n: c[i:i + self._batch_size] for n, c in zip(names, columns)}
+
+    def _batch_source(self, node):
+        """
+        reads rows and builds batches
+        """
+        if node._thisset is None:
+            raise IterException("this class contains no iterator")
+        names = [c.Name for c in node.Schema]
+        rows = []
+        for row in node._thisset:
+            rows.append(row)
+            if len(rows) >= self._batch_size:
+                yield self._transpose(rows, names)
+                rows = []
+        if rows:
+            yield self._transpose(rows, names)
+
+    def _transpose(self, rows, names):
+        """
+        converts a list of rows into a batch
+        """
+        if isinstance(rows[0], dict):
+            batch = {n: [r[n] for r in rows] for n in names}
+        else:
+            batch = {n: [r[i] for r in rows] for i, n in enumerate(names)}
+        if self._use_numpy:
+            for n, values in batch.items():
+                batch[n] = self._to_array(values)
+        return batch
+
+    @staticmethod
+    def _to_array(values):
+        """
+        converts a list into a :epkg:`numpy` array
+        if it only contains numbers of the same type
+        """
+        types = set(map(type, values))
+        if len(types) != 1 or types.pop() not in (int, float, bool):
+            return values
+        try:
+            return numpy.array(values)
+        except OverflowError:
+            return values
+
+    def _batch_select(self, node, plan):
+        """
+        select on batches
+        """
+        child = plan["inputs"][0]
+        for batch in self.iter_batches(child):
+            size = batch_length(batch)
+            inputs = self._inputs(child, batch)
+            yield {col.Name: self.evaluate(col, inputs, size)
+                   for col in plan["schema"]}
+
+    def _batch_where(self, node, plan):
+        """
+        where on batches, the condition produces a mask
+        """
+        child = plan["inputs"][0]
+        names = [c.Name for c in child.Schema]
+        for batch in self.iter_batches(child):
+            size = batch_length(batch)
+            mask = self.evaluate(
+                plan["condition"], self._inputs(child, batch), size)
+            res = {n: batch_compress(batch[n], mask) for n in names}
+            if plan["append_condition"]:
+                res[plan["condition"].Name] = batch_compress(mask, mask)
+            if batch_length(res) > 0:
+                yield res
+
+    def _batch_groupby(self, node, plan):
+        """
+        groupby on batches, groups are stored in a dictionary
+        """
+        child = plan["inputs"][0]
+        schema = plan["schema"]
+        aggs = [c for c in schema if isinstance(c, ColumnGroupType)]
+        firsts = [c for c in schema if not isinstance(c, ColumnGroupType)]
+        ops = [c._opgr for c in aggs]
+        agg_inputs, positions = distinct_expressions(
+            [c.Parent[0] for c in aggs], child.Schema)
+        groups = {}
+        for batch in self.iter_batches(child):
+            size = batch_length(batch)
+            inputs = self._inputs(child, batch)
+            keys = list(zip(*[batch_column_tolist(batch[k])
+                              for k in plan["keys"]]))
+            fvals = [batch_column_tolist(self.evaluate(c, inputs, size))
+                     for c in firsts]
+            avals = [batch_column_tolist(self.evaluate(c, inputs, size))
+                     for c in agg_inputs]
+            for i, key in enumerate(keys):
+                grp = groups.get(key)
+                if grp is None:
+                    grp = groups[key] = [tuple(v[i] for v in fvals)] + \
+                        [op.init() for op in ops]
+                for j, p in enumerate(positions):
+                    grp[j + 1] = ops[j].update(grp[j + 1], avals[p][i])
+
+        columns = {c.Name: [] for c in schema}
+        for key in (sorted(groups) if plan["sort_keys"] else groups):
+            grp = groups[key]
+            for c, v in zip(firsts, grp[0]):
+                columns[c.Name].append(v)
+            for j, c in enumerate(aggs):
+                columns[c.Name].append(ops[j].finalize(grp[j + 1]))
+        names = [c.Name for c in schema]
+        yield from self._split([columns[n] for n in names], names)
+
+    def _batch_unionall(self, node, plan):
+        """
+        unionall on batches, missing columns are filled with @see cl NA
+        """
+        na = NA()
+        names = [c.Name for c in node.Schema]
+        for child in plan["inputs"]:
+            for batch in self.iter_batches(child):
+                size = batch_length(batch)
+                yield {n: batch[n] if n in batch else [na] * size for n in names}
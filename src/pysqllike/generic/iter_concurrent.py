@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+@file
+@brief Reads several iterators at the same time with threads.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def concurrent_chain(iterators, max_workers=None, chunk_size=256, queue_size=None):
+    """
+    Reads every iterator in a background thread and returns
+    the objects as they come. Every thread sends its objects
+    by chunks through a bounded queue: a thread stops reading
+    when the queue is full.
+
+    @param      iterators       list of iterators
+    @param      max_workers     maximum number of threads (None for one thread per iterator)
+    @param      chunk_size      number of objects sent at once
+    @param      queue_size      maximum number of chunks waiting in the queue,
+                                None for four chunks per thread
+    @return                     iterator on objects
+
+    The order of the objects coming from one iterator is kept.
+    An exception raised by one iterator is raised again by this function.
+    If the iteration stops before the end (the generator is closed),
+    the threads stop after their current object.
+    """
+    iterators = list(iterators)
+    if len(iterators) == 0:
+        return
+    if max_workers is None:
+        max_workers = len(iterators)
+    if queue_size is None:
+        queue_size = 4 * max_workers
+    chunks = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    done = object()
+
+    def send(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(it):
+        try:
+            chunk = []
+            for obj in it:
+                if stop.is_set():
+                    return
+                chunk.append(obj)
+                if len(chunk) >= chunk_size:
+                    if not send(chunk):
+                        return
+                    chunk = []
+            if chunk:
+                send(chunk)
+        except BaseException as e:  # pylint: disable=W0703
+            send(e)
+        finally:
+            if hasattr(it, "close"):
+                it.close()
+            send(done)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for it in iterators:
+            executor.submit(produce, it)
+        remaining = len(iterators)
+        while remaining > 0:
+            item = chunks.get()
+            if item is done:
+                remaining -= 1
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                yield from item
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
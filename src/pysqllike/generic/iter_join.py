@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+@file
+@brief Algorithms used to join two tables, rows are tuples.
+"""
+from itertools import chain
+from operator import itemgetter
+from .iter_exceptions import IterException
+from .iter_spill import SpillFile, estimate_size
+
+
+_swap_how = {"inner": "inner", "left": "right",
+             "right": "left", "full": "full"}
+
+
+def key_getter(positions):
+    """
+    returns a function which extracts the key of a row,
+    the key is always a tuple
+
+    @param      positions       positions of the key columns in a row
+    @return                     function
+    """
+    if len(positions) == 1:
+        pos = positions[0]
+        return lambda row: (row[pos],)
+    return itemgetter(*positions)
+
+
+def has_null(key):
+    """
+    tells if a key contains None, such a key never matches anything (SQL behavior)
+
+    @param      key     tuple
+    @return             boolean
+    """
+    return None in key
+
+
+def hash_join(left, right, left_key, right_key, how="inner", build_left=False,
+              on_build=None):
+    """
+    Joins two sequences of rows with a hash table.
+    The hash table is built on one side (the build side),
+    the other side is read once (the probe side) and never stored.
+
+    @param      left            iterator on rows (left side)
+    @param      right           iterator on rows (right side)
+    @param      left_key        function which returns the key of a left row
+    @param      right_key       function which returns the key of a right row
+    @param      how             ``'inner'``, ``'left'``, ``'right'``, ``'full'``
+    @param      build_left      builds the hash table on the left side (right side otherwise)
+    @param      on_build        function called with the hash table (a dictionary
+                                ``{ key: rows }``) once it is built, before the probe
+                                side is read
+    @return                     iterator on pairs ``(left row, right row)``,
+                                the missing row of an outer join is None
+
+    Rows of an outer side without any match are returned after the others
+    if they come from the build side.
+    """
+    if how not in _swap_how:
+        raise ValueError("unexpected value for how: {0}".format(how))
+    if build_left:
+        for r, l in hash_join(right, left, right_key, left_key,
+                              how=_swap_how[how], build_left=False,
+                              on_build=on_build):
+            yield l, r
+        return
+
+    table = {}
+    for row in right:
+        key = right_key(row)
+        rows = table.get(key)
+        if rows is None:
+            table[key] = [row]
+        else:
+            rows.append(row)
+    if on_build is not None:
+        on_build(table)
+
+    keep_left = how in ("left", "full")
+    matched = set() if how in ("right", "full") else None
+    for row in left:
+        key = left_key(row)
+        rows = None if has_null(key) else table.get(key)
+        if rows:
+            if matched is not None:
+                matched.add(key)
+            for r in rows:
+                yield row, r
+        elif keep_left:
+            yield row, None
+
+    if matched is not None:
+        for key, rows in table.items():
+            if key not in matched:
+                for r in rows:
+                    yield None, r
+
+
+def grace_hash_join(left, right, left_key, right_key, how="inner", build_left=False,
+                    memory_limit=None, partitions=16, directory=None, max_depth=3,
+                    on_build=None, _depth=0):
+    """
+    Joins two sequences of rows with a hash table
+    like @see fn hash_join but the build side is kept in memory
+    only if its estimated size is below *memory_limit*.
+    Otherwise, both sides are split into *partitions* temporary files
+    (see @see cl SpillFile) based on the hash of the key,
+    and every pair of partitions is joined the same way
+    (a partition may be split again with a different hash).
+
+    @param      left            iterator on rows (left side)
+    @param      right           iterator on rows (right side)
+    @param      left_key        function which returns the key of a left row
+    @param      right_key       function which returns the key of a right row
+    @param      how             ``'inner'``, ``'left'``, ``'right'``, ``'full'``
+    @param      build_left      builds the hash table on the left side (right side otherwise)
+    @param      memory_limit    memory budget in bytes for the build side (None for no limit)
+    @param      partitions      number of partitions
+    @param      directory       directory for the temporary files
+    @param      max_depth       a partition is not split more than *max_depth* times,
+                                a key too frequent cannot be split
+    @param      on_build        see @see fn hash_join, it is only called
+                                if the build side fits in memory
+    @return                     iterator on pairs ``(left row, right row)``,
+                                the missing row of an outer join is None
+
+    The function returns the same pairs as @see fn hash_join
+    but not in the same order if the build side is partitioned.
+    """
+    if how not in _swap_how:
+        raise ValueError("unexpected value for how: {0}".format(how))
+    if build_left:
+        for r, l in grace_hash_join(right, left, right_key, left_key,
+                                    how=_swap_how[how], build_left=False,
+                                    memory_limit=memory_limit, partitions=partitions,
+                                    directory=directory, max_depth=max_depth,
+                                    on_build=on_build, _depth=_depth):
+            yield l, r
+        return
+    if memory_limit is None:
+        yield from hash_join(left, right, left_key, right_key, how=how,
+                             on_build=on_build)
+        return
+
+    right = iter(right)
+    buffer = []
+    size = 0
+    for row in right:
+        buffer.append(row)
+        size += estimate_size(row)
+        if size > memory_limit:
+            break
+    else:
+        # the build side fits in memory
+        yield from hash_join(left, buffer, left_key, right_key, how=how,
+                             on_build=on_build)
+        return
+    if _depth >= max_depth:
+        yield from hash_join(left, chain(buffer, right), left_key, right_key, how=how)
+        return
+
+    parts_left = []
+    parts_right = []
+    try:
+        for i in range(partitions):
+            parts_left.append(SpillFile(directory))
+            parts_right.append(SpillFile(directory))
+        for row in chain(buffer, right):
+            parts_right[hash((_depth, right_key(row))) % partitions].append(row)
+        buffer = None
+        for row in left:
+            parts_left[hash((_depth, left_key(row))) % partitions].append(row)
+
+        for pl, pr in zip(parts_left, parts_right):
+            if len(pr) == 0 and how in ("inner", "right"):
+                continue
+            if len(pl) == 0 and how in ("inner", "left"):
+                continue
+            yield from grace_hash_join(pl, pr, left_key, right_key, how=how,
+                                       memory_limit=memory_limit, partitions=partitions,
+                                       directory=directory, max_depth=max_depth,
+                                       _depth=_depth + 1)
+    finally:
+        for part in parts_left + parts_right:
+            part.close()
+
+
+def merge_join(left, right, left_key, right_key, how="inner", ascending=True):
+    """
+    Joins two sequences of rows sorted by their key (sort-merge join),
+    both sides are read once in lockstep, the function only stores the
+    right rows sharing the current key.
+
+    @param      left            iterator on rows (left side) sorted by key
+    @param      right           iterator on rows (right side) sorted by key
+    @param      left_key        function which returns the key of a left row
+    @param      right_key       function which returns the key of a right row
+    @param      how             ``'inner'``, ``'left'``, ``'right'``, ``'full'``
+    @param      ascending       order of both sides
+    @return                     iterator on pairs ``(left row, right row)``,
+                                the missing row of an outer join is None
+
+    The pairs are sorted by key. The function raises an exception
+    @see cl IterException if one side is not sorted.
+    A key containing None never matches anything (see @see fn has_null),
+    such a row of an outer side is returned when it is read.
+    """
+    if how not in _swap_how:
+        raise ValueError("unexpected value for how: {0}".format(how))
+    keep_left = how in ("left", "full")
+    keep_right = how in ("right", "full")
+
+    def before(a, b):
+        return a < b if ascending else a > b
+
+    def check(it, getkey, side):
+        prev = None
+        for row in it:
+            key = getkey(row)
+            if has_null(key):
+                yield key, row
+                continue
+            if prev is not None and before(key, prev):
+                raise IterException(
+                    "{0} side is not sorted: {1} after {2}".format(side, key, prev))
+            prev = key
+            yield key, row
+
+    left = check(left, left_key, "left")
+    right = check(right, right_key, "right")
+    lk, lrow = next(left, (None, None))
+    rk, rrow = next(right, (None, None))
+    while lrow is not None and rrow is not None:
+        if has_null(lk):
+            if keep_left:
+                yield lrow, None
+            lk, lrow = next(left, (None, None))
+        elif has_null(rk):
+            if keep_right:
+                yield None, rrow
+            rk, rrow = next(right, (None, None))
+        elif before(lk, rk):
+            if keep_left:
+                yield lrow, None
+            lk, lrow = next(left, (None, None))
+        elif before(rk, lk):
+            if keep_right:
+                yield None, rrow
+            rk, rrow = next(right, (None, None))
+        else:
+            key = rk
+            run = [rrow]
+            rk, rrow = next(right, (None, None))
+            while rrow is not None and rk == key:
+                run.append(rrow)
+                rk, rrow = next(right, (None, None))
+            while lrow is not None and lk == key:
+                for r in run:
+                    yield lrow, r
+                lk, lrow = next(left, (None, None))
+    while lrow is not None:
+        if keep_left:
+            yield lrow, None
+        lk, lrow = next(left, (None, None))
+    while rrow is not None:
+        if keep_right:
+            yield None, rrow
+        rk, rrow = next(right, (None, None))
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+@file
+@brief Aggregates rows with several workers, frequent keys are split between workers.
+"""
+import multiprocessing
+import queue
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import chain, islice
+
+
+def aggregate_partition(items, operators, positions, nfirsts, groups=None):
+    """
+    Aggregates a list of rows.
+
+    @param      items           list of ``(key, values)``
+    @param      operators       list of @see cl ColumnGroupOperator
+    @param      positions       position in *values* of the value every operator receives
+    @param      nfirsts         the first *nfirsts* values are kept for the first row of a group
+    @param      groups          dictionary to update, None to create a new one
+    @return                     dictionary ``{ key: (first values, states) }``
+    """
+    if groups is None:
+        groups = {}
+    for key, values in items:
+        grp = groups.get(key)
+        if grp is None:
+            grp = groups[key] = (values[:nfirsts], [op.init() for op in operators])
+        states = grp[1]
+        for j, (op, pos) in enumerate(zip(operators, positions)):
+            states[j] = op.update(states[j], values[pos])
+    return groups
+
+
+def aggregate_queue(rows, operators, positions, nfirsts):
+    """
+    Aggregates the rows a worker receives through a queue
+    (lists of ``(key, values)``) until it receives None.
+    The function and its arguments can be sent to another process
+    with :epkg:`pickle` if the operators can and the queue is shared
+    between processes.
+
+    @param      rows            queue
+    @param      operators       list of @see cl ColumnGroupOperator
+    @param      positions       position in *values* of the value every operator receives
+    @param      nfirsts         the first *nfirsts* values are kept for the first row of a group
+    @return                     dictionary ``{ key: (first values, states) }``
+    """
+    groups = {}
+    while True:
+        items = rows.get()
+        if items is None:
+            return groups
+        aggregate_partition(items, operators, positions, nfirsts, groups)
+
+
+def find_heavy_hitters(keys, n_jobs, skew_threshold=0.5):
+    """
+    Returns the keys frequent enough to slow down the worker
+    which would receive all of them.
+
+    @param      keys            sample of keys
+    @param      n_jobs          number of workers
+    @param      skew_threshold  a key is frequent if its frequency in the sample exceeds
+                                *skew_threshold / n_jobs*
+    @return                     set of keys
+    """
+    if len(keys) == 0:
+        return set()
+    limit = skew_threshold * len(keys) / n_jobs
+    return set(k for k, c in Counter(keys).items() if c > limit)
+
+
+def partition_rows(items, n_jobs, sample_size=1000, skew_threshold=0.5, chunk_size=1000):
+    """
+    Assigns every row to a worker based on the hash of its key.
+    The first *sample_size* rows are used to find the frequent keys
+    (see @see fn find_heavy_hitters), the rows of such a key are split
+    into chunks of *chunk_size* consecutive rows, the key is salted with
+    the chunk number and every chunk goes to the next worker.
+
+    @param      items           iterator on ``(key, values)``
+    @param      n_jobs          number of workers
+    @param      sample_size     number of rows used to find the frequent keys
+    @param      skew_threshold  see @see fn find_heavy_hitters
+    @param      chunk_size      number of consecutive rows of a frequent key sent to the same worker
+    @return                     iterator on ``(worker, (key, salt), values)``
+    """
+    items = iter(items)
+    sample = list(islice(items, sample_size))
+    heavy = find_heavy_hitters([k for k, v in sample], n_jobs, skew_threshold)
+    counts = {}
+    for key, values in chain(sample, items):
+        if key in heavy:
+            nb = counts.get(key, 0)
+            counts[key] = nb + 1
+            salt = nb // chunk_size
+            yield (hash(key) + salt) % n_jobs, (key, salt), values
+        else:
+            yield hash(key) % n_jobs, (key, 0), values
+
+
+def parallel_aggregate(items, operators, positions, nfirsts, n_jobs, executor=None,
+                       sample_size=1000, skew_threshold=0.5, chunk_size=1000,
+                       batch_size=256, queue_size=16):
+    """
+    Aggregates rows by key with *n_jobs* workers.
+    Every worker is a single task which owns a queue and aggregates
+    the rows it receives (see @see fn aggregate_queue),
+    the rows are sent to the queues by @see fn partition_rows:
+    a key goes to one worker unless it is frequent, its rows
+    are then split between all workers.
+    The partial aggregations of a frequent key are then merged
+    (see @see cl ColumnGroupOperator) in the order of the rows,
+    an order-dependent aggregation (first, last) returns the same result
+    as a sequential aggregation.
+
+    @param      items           iterator on ``(key, values)``
+    @param      operators       list of @see cl ColumnGroupOperator
+    @param      positions       position in *values* of the value every operator receives
+    @param      nfirsts         the first *nfirsts* values are kept for the first row of a group
+    @param      n_jobs          number of workers
+    @param      executor        an executor from :epkg:`concurrent.futures` able to run
+                                *n_jobs* tasks at the same time, None to create a pool
+                                of *n_jobs* threads
+    @param      sample_size     see @see fn partition_rows
+    @param      skew_threshold  see @see fn find_heavy_hitters
+    @param      chunk_size      see @see fn partition_rows
+    @param      batch_size      number of rows sent at once to a worker
+    @param      queue_size      maximum number of batches waiting in the queue of a worker
+    @return                     iterator on ``(key, (first values, states))``
+
+    The groups do not follow the order of their first row.
+    Threads only run one accumulator at a time, the work is spread over
+    several processes with a :epkg:`ProcessPoolExecutor`,
+    the queues are then shared through a :epkg:`multiprocessing` manager
+    and the operators must be serializable with :epkg:`pickle`.
+    The rows are dispatched by the calling thread, the function is
+    only faster than a sequential aggregation if updating the accumulators
+    costs more than sending the rows to the workers.
+    """
+    if n_jobs <= 0:
+        raise ValueError("n_jobs must be strictly positive")
+    own = executor is None
+    if own:
+        executor = ThreadPoolExecutor(max_workers=n_jobs)
+    elif getattr(executor, "_max_workers", n_jobs) < n_jobs:
+        raise ValueError(
+            "the executor must be able to run {0} tasks at the same time".format(n_jobs))
+    manager = None
+    futures = []
+    try:
+        if isinstance(executor, ProcessPoolExecutor):
+            manager = multiprocessing.Manager()
+            queues = [manager.Queue(maxsize=queue_size) for i in range(n_jobs)]
+        else:
+            queues = [queue.Queue(maxsize=queue_size) for i in range(n_jobs)]
+        for q in queues:
+            futures.append(executor.submit(
+                aggregate_queue, q, operators, positions, nfirsts))
+
+        def send(worker, items):
+            while True:
+                try:
+                    queues[worker].put(items, timeout=0.1)
+                    return
+                except queue.Full:
+                    if futures[worker].done():
+                        # the worker failed, result raises its exception
+                        futures[worker].result()
+                        raise RuntimeError("worker {0} stopped".format(worker))
+
+        buffers = [[] for i in range(n_jobs)]
+        for worker, key, values in partition_rows(items, n_jobs, sample_size=sample_size,
+                                                  skew_threshold=skew_threshold,
+                                                  chunk_size=chunk_size):
+            buf = buffers[worker]
+            buf.append((key, values))
+            if len(buf) >= batch_size:
+                send(worker, buf)
+                buffers[worker] = []
+        for worker, buf in enumerate(buffers):
+            if buf:
+                send(worker, buf)
+            send(worker, None)
+
+        # a salted key is aggregated by one worker which receives its rows in order,
+        # sorting the partial aggregations by salt follows the order of the rows
+        partials = {}
+        for fut in futures:
+            for (key, salt), grp in fut.result().items():
+                partials.setdefault(key, []).append((salt, grp))
+        for key, parts in partials.items():
+            parts.sort(key=lambda p: p[0])
+            grp = parts[0][1]
+            for _, other in parts[1:]:
+                grp = (grp[0], [op.merge(a, b)
+                                for op, a, b in zip(operators, grp[1], other[1])])
+            yield key, grp
+    finally:
+        # stops the workers if the aggregation was interrupted
+        for worker, fut in enumerate(futures):
+            while not fut.done():
+                try:
+                    queues[worker].put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+        if own:
+            executor.shutdown(wait=True)
+        if manager is not None:
+            manager.shutdown()
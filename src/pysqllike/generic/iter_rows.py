@@ -4,9 +4,20 @@
 @brief An class which iterates on any set.
 """
 
+import heapq
+from itertools import chain, combinations, islice
+from operator import itemgetter
 from .iter_exceptions import IterException, SchemaException
-from .column_type import ColumnType, ColumnTableType, ColumnGroupType
-from .others_types import NoSortClass, GroupByContainer, NA
+from .column_type import ColumnType, ColumnTableType, ColumnGroupType, ColumnWindowType, ColumnConstantType
+from .column_operator import OperatorId
+from .others_types import NA
+from .column_compiler import CompiledColumns, distinct_expressions, compile_accumulators
+from .pipeline_compiler import PipelineCompiler
+from .iter_batch import BatchExecutor, batch_to_rows
+from .iter_spill import external_sort, external_distinct, external_aggregate
+from .iter_concurrent import concurrent_chain
+from .iter_parallel import parallel_aggregate
+from .iter_join import grace_hash_join, merge_join, key_getter, has_null
 
 
 class IterRow:
@@ -85,6 +96,8 @@ class IterRow:
         self._schema = truesch
         self._thisset = anyset
         self._as_dict = as_dict
+        self._plan = None
+        self._sorted = None
 
         for sch in self._schema:
             if sch.Name in self.__dict__:
@@ -99,6 +112,61 @@ class IterRow:
         """
         return self._schema
 
+    @property
+    def Plan(self):
+        """
+        Returns the operation which produced this table,
+        a dictionary ``{ "op": "select", "inputs": (tbl, ), ... }``
+        or None if the table was not built by any operator.
+        For select, where and orderby, ``"rows"`` is a function
+        which applies the operation on another iterator than the input rows.
+        """
+        return self._plan
+
+    def declare_sorted(self, *nochange, ascending=True):
+        """
+        Declares the rows of this table are already sorted,
+        the table is not modified, some operators such as
+        @see me join use this information.
+
+        @param      nochange        list of columns the rows are sorted by
+        @param      ascending       order
+        @return                     self
+        """
+        if len(nochange) == 0:
+            raise SchemaException("no column to sort by")
+        names = [c.Name if isinstance(c, ColumnType) else c for c in nochange]
+        for n in names:
+            if n not in self.__dict__ or not isinstance(self.__dict__[n], ColumnType):
+                raise SchemaException(
+                    "unable to find column {0} in schema {1}".format(n, self))
+        self._sorted = (names, ascending)
+        return self
+
+    def _sort_order(self):
+        """
+        Returns the order of the rows if it is known
+        (see @see me declare_sorted, @see me orderby).
+
+        @return     ``(list of column names, ascending)`` or None
+        """
+        if self._sorted is not None:
+            return self._sorted
+        plan = self._plan
+        if plan is None:
+            return None
+        if plan["op"] in ("orderby", "merge_sorted"):
+            return plan["keys"], plan["ascending"]
+        if plan["op"] == "window" and plan["partition_by"] + plan["order_by"]:
+            return plan["partition_by"] + plan["order_by"], plan["ascending"]
+        if plan["op"] in ("where", "limit", "semijoin", "antijoin", "window"):
+            # these operators keep the order
+            return plan["inputs"][0]._sort_order()
+        if plan["op"] == "join" and plan["algorithm"] == "merge":
+            if plan["how"] in ("inner", "left") or plan["left_keys"] == plan["right_keys"]:
+                return plan["left_keys"], plan["ascending"]
+        return None
+
     def __str__(self):
         """
         usual
@@ -135,6 +203,21 @@ class IterRow:
         for _ in self._schema:
             _.set_none()
 
+    def close(self):
+        """
+        Stops the iteration and releases the resources held by this table
+        and by the tables it comes from (see @see me Plan):
+        generators are closed (their *finally* clauses are executed)
+        and columns values are set to None.
+        """
+        if hasattr(self._thisset, "close"):
+            self._thisset.close()
+        if self._plan is not None:
+            for tbl in self._plan["inputs"]:
+                tbl.close()
+        for _ in self._schema:
+            _.set_none()
+
     def print_schema(self):
         """
         calls @see me print_parent on each column
@@ -211,23 +294,30 @@ class IterRow:
             if not isinstance(_, ColumnType):
                 raise TypeError("we expect a ColumnType for column")
 
-        def itervalues():
-            for row in self._thisset:
+        # the expressions are compiled once, every row calls a single function
+        compiled = CompiledColumns(schema, self._schema, as_dict=as_dict)
+
+        def itervalues(source=None):
+            fdict = None
+            ftuple = None
+            for row in self._thisset if source is None else source:
                 if isinstance(row, dict):
                     for col in self._schema:
                         col.set(row[col.Name])
+                    if fdict is None:
+                        fdict = compiled.function(True)
+                    yield fdict(row)
                 else:
                     for col, r in zip(self._schema, row):
                         col.set(r)
-
-                if as_dict:
-                    yield {_.Name: _() for _ in schema}
-                else:
-                    yield tuple([_() for _ in schema])
+                    if ftuple is None:
+                        ftuple = compiled.function(False)
+                    yield ftuple(row)
 
         tbl = IterRow(schema, anyset=itervalues(), as_dict=as_dict)
         for c in schema:
             c.set_owner(tbl)
+        tbl._plan = dict(op="select", inputs=(self,), schema=schema, rows=itervalues)
         return tbl
 
     def where(self, condition, as_dict=True, append_condition=False):
@@ -270,35 +360,58 @@ class IterRow:
         if append_condition:
             schema.append(condition)
 
-        def itervalues():
-            for row in self._thisset:
+        # the condition and the output row are evaluated by a single function,
+        # it returns None when the condition is not verified
+        compiled = CompiledColumns(
+            schema, self._schema, condition=condition, as_dict=as_dict)
+
+        def itervalues(source=None):
+            fdict = None
+            ftuple = None
+            for row in self._thisset if source is None else source:
                 if isinstance(row, dict):
                     for col in self._schema:
                         col.set(row[col.Name])
+                    if fdict is None:
+                        fdict = compiled.function(True)
+                    res = fdict(row)
                 else:
                     for col, r in zip(self._schema, row):
                         col.set(r)
+                    if ftuple is None:
+                        ftuple = compiled.function(False)
+                    res = ftuple(row)
 
-                if condition():
-                    if as_dict:
-                        yield {_.Name: _() for _ in schema}
-                    else:
-                        yield tuple([_() for _ in schema])
+                if res is not None:
+                    yield res
 
         tbl = IterRow(schema, anyset=itervalues(), as_dict=as_dict)
         for c in schema:
             c.set_owner(tbl)
+        tbl._plan = dict(op="where", inputs=(self,), schema=schema,
+                         condition=condition, append_condition=append_condition,
+                         rows=itervalues)
         return tbl
 
-    def orderby(self, *nochange, as_dict=True, ascending=True):
+    def orderby(self, *nochange, as_dict=True, ascending=True, memory_limit=None,
+                limit=None):
         """
         This function sorts elements from an IterRow instance.
 
         @param      nochange            list of columns used to sort
         @param      ascending           order
         @param      as_dict             returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @param      memory_limit        memory budget in bytes, None for no limit
+        @param      limit               only returns the first *limit* rows, None for all
         @return                         IterRow
 
+        If the rows held in memory exceed *memory_limit*, they are sorted
+        and stored in a temporary file, the sorted files are then merged
+        (see @see fn external_sort). The sort is stable.
+        If *limit* is specified, the function keeps the best rows
+        in a bounded heap (*memory_limit* is not used):
+        the cost is *O(n log k)* and only *k* rows are kept in memory.
+
         .. exref::
             :title: order by
 
@@ -313,14 +426,16 @@ class IterRow:
         """
         schema = [v.copy(None)
                   for v in self._schema]  # we do not know the owner yet
+        names = [c.Name for c in schema]
 
-        def itervalues():
+        def itervalues(source):
             colsi = None
-            for row in self._thisset:
+            for row in self._thisset if source is None else source:
                 if isinstance(row, dict):
                     for col in self._schema:
                         col.set(row[col.Name])
                     key = tuple(row[k.Name] for k in nochange)
+                    values = tuple(row[n] for n in names)
                 else:
                     for col, r in zip(self._schema, row):
                         col.set(r)
@@ -330,19 +445,98 @@ class IterRow:
                                 self._schema,
                                 k.Name) for k in nochange]
                     key = tuple(row[k] for k in colsi)
-
+                    values = tuple(row)
+
+                # rows are stored as tuples, they are smaller than dictionaries
+                yield key, values
+
+        def itervalues_sort(source=None):
+            if limit is None:
+                rows = external_sort(itervalues(source), key=itemgetter(0),
+                                     reverse=not ascending,
+                                     memory_limit=memory_limit)
+            elif ascending:
+                rows = heapq.nsmallest(limit, itervalues(source), key=itemgetter(0))
+            else:
+                rows = heapq.nlargest(limit, itervalues(source), key=itemgetter(0))
+            for key, row in rows:
                 if as_dict:
-                    yield key, {_.Name: _() for _ in schema}
+                    yield dict(zip(names, row))
                 else:
-                    yield key, tuple([_() for _ in schema])
-
-        def itervalues_sort():
-            for key, row in sorted(itervalues(), reverse=not ascending):
-                yield row
+                    yield row
 
         tbl = IterRow(schema, anyset=itervalues_sort(), as_dict=as_dict)
         for c in schema:
             c.set_owner(tbl)
+        tbl._plan = dict(op="orderby", inputs=(self,), schema=schema,
+                         keys=[k.Name for k in nochange], ascending=ascending,
+                         memory_limit=memory_limit, limit=limit, rows=itervalues_sort)
+        return tbl
+
+    def limit(self, n, offset=0, as_dict=True):
+        """
+        Returns at most *n* rows after skipping the first *offset* rows
+        (same behavior as SQL's ``LIMIT n OFFSET offset``).
+
+        @param      n           maximum number of rows
+        @param      offset      number of rows to skip
+        @param      as_dict     returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @return                 IterRow
+
+        The function stops reading the input as soon as it has enough rows
+        and closes the tables it comes from (see @see me close).
+        If the table is produced by @see me orderby, the sort is replaced by
+        a bounded heap which only keeps ``offset + n`` rows.
+
+        .. exref::
+            :title: limit
+
+            ::
+
+                tbl = IterRow ( ... )
+                iter = tbl.orderby(tbl.age).limit(10)
+                res = list(iter)
+        """
+        if n < 0 or offset < 0:
+            raise ValueError("n and offset must be positive")
+
+        source = self
+        plan = self._plan
+        if plan is not None and plan["op"] == "orderby" and plan["limit"] is None:
+            # top-k, the new sort reads the input of the previous one
+            child = plan["inputs"][0]
+            keys = [child._schema[self._findschema(child._schema, k)]
+                    for k in plan["keys"]]
+            source = child.orderby(*keys, as_dict=self._as_dict,
+                                   ascending=plan["ascending"],
+                                   limit=offset + n)
+
+        schema = [v.copy(None)
+                  for v in self._schema]  # we do not know the owner yet
+        names = [c.Name for c in schema]
+
+        def itervalues():
+            try:
+                if n == 0:
+                    return
+                for row in islice(source._thisset, offset, offset + n):
+                    if isinstance(row, dict):
+                        if as_dict:
+                            yield {k: row[k] for k in names}
+                        else:
+                            yield tuple(row[k] for k in names)
+                    elif as_dict:
+                        yield dict(zip(names, row))
+                    else:
+                        yield tuple(row)
+            finally:
+                source.close()
+
+        tbl = IterRow(schema, anyset=itervalues(), as_dict=as_dict)
+        for c in schema:
+            c.set_owner(tbl)
+        tbl._plan = dict(op="limit", inputs=(source,), schema=schema,
+                         n=n, offset=offset)
         return tbl
 
     def _findschema(self, schema, name):
@@ -358,17 +552,88 @@ class IterRow:
                 return i
         raise IndexError()
 
-    def groupby(self, *nochange, as_dict=True, **changed):
+    @staticmethod
+    def _group_columns(column):
+        """
+        returns the aggregated columns (see @see cl ColumnGroupType)
+        an expression depends on
+        """
+        if isinstance(column, ColumnGroupType):
+            return [column]
+        res = []
+        for p in column._parent or []:
+            if isinstance(p, ColumnType):
+                res.extend(IterRow._group_columns(p))
+        return res
+
+    @staticmethod
+    def _check_having(column, keys):
+        """
+        checks a condition on groups only depends on the group keys,
+        aggregated columns (see @see cl ColumnGroupType) and constants,
+        any other column would receive the value of the last row of a group
+
+        @param      column      condition
+        @param      keys        ids of the columns the groups are made of
+        """
+        if id(column) in keys or isinstance(column, (ColumnGroupType, ColumnConstantType)):
+            return
+        if column._owner is not None or not column._parent:
+            raise IterException(
+                "having can only use the group keys and aggregated columns, not {0}".format(column))
+        for p in column._parent:
+            if isinstance(p, ColumnType):
+                IterRow._check_having(p, keys)
+
+    def groupby(self, *nochange, as_dict=True, sort_keys=True, having=None,
+                memory_limit=None, n_jobs=None, executor=None, **changed):
         """
         This function applies a groupby (same behavior as SQL's version)
 
-        @param      nochange    list of fields to keep
-        @param      changed     list of custom fields
-        @param      as_dict     returns results as a list of dictionaries [ { "colname": value, ... } ]
-        @return                 IterRow
+        @param      nochange        list of fields to keep
+        @param      changed         list of custom fields
+        @param      as_dict         returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @param      sort_keys       sort the groups by keys, otherwise,
+                                    the groups follow the order of their first row
+        @param      having          condition on the groups (same behavior as SQL's ``HAVING``),
+                                    it can use aggregated columns (see @see cl ColumnGroupType)
+                                    and the columns in *nochange*
+        @param      memory_limit    memory budget in bytes for the groups, None for no limit
+        @param      n_jobs          number of workers, None to aggregate in this thread
+        @param      executor        executor from :epkg:`concurrent.futures` the workers run on,
+                                    None for a pool of *n_jobs* threads
+        @return                     IterRow
 
         @warning The function does not guarantee the order of the output columns.
 
+        The rows are aggregated in a hash table whose keys are the group keys,
+        the input is read only once and every aggregated column
+        updates an accumulator (see @see cl ColumnGroupOperator).
+        All accumulators of a group are updated by one generated function,
+        an expression received by several aggregated columns is evaluated once.
+        Only the distinct keys are sorted if *sort_keys* is True.
+        The condition *having* is checked when a group is finalized,
+        the row is not created if it is false. An aggregated column
+        the condition uses but which is not part of the results is computed
+        as any other aggregated column.
+        If the groups exceed *memory_limit*, the partial aggregations and the rows
+        not read yet are stored in temporary files by hash of the key
+        and every file is aggregated separately (see @see fn external_aggregate),
+        the accumulators must be serializable with :epkg:`pickle`.
+        The groups are then sorted with @see fn external_sort if *sort_keys* is True,
+        otherwise they do not follow the order of their first row.
+
+        If *n_jobs* is specified, the expressions are evaluated by this thread
+        and the accumulators are updated by *n_jobs* workers, every worker
+        owns a queue and receives the keys whose hash it is responsible for.
+        The most frequent keys in the first rows are split between all workers,
+        and the partial aggregations are merged at the end (see @see fn parallel_aggregate).
+        Threads update one accumulator at a time, *executor* can be
+        a :epkg:`ProcessPoolExecutor` if the accumulators can be pickled.
+        The rows are still read and dispatched by this thread, the parallel
+        aggregation is only faster when the accumulators cost more than this.
+        The groups do not follow the order of their first row if *sort_keys* is False.
+
         .. exref::
             :title: group by
 
@@ -381,6 +646,9 @@ class IterRow:
 
                 iter = tbl.groupby(tbl.gender, len_nom=tbl.nom.len(), avg_age=tbl.age.avg())
         """
+        if n_jobs is not None and memory_limit is not None:
+            raise ValueError("memory_limit and n_jobs cannot be used together")
+
         # selftbl = self.orderby(nochange, as_dict=as_dict)
         # newschema = list(nochange) + [(k, None) for k in changed.keys()]
 
@@ -407,37 +675,63 @@ class IterRow:
             if not isinstance(_, ColumnType):
                 raise TypeError("we expect a ColumnType for column")
 
-        def to_matrix(iter):
-            mat = list(iter)
-            if isinstance(mat[0], dict):
-                res = {}
-                for k in mat[0]:
-                    i = self._findschema(schema, k)
-                    col = schema[i]
-                    if isinstance(col, ColumnGroupType):
-                        temp = GroupByContainer(m[k] for m in mat)
-                        col.set(temp)
-                        res[k] = col()
-                    else:
-                        temp = mat[0][k]
-                        col.set(temp)
-                        res[k] = temp
-                return res
-            else:
-                raise NotImplementedError()
-                # res = []
-                # for i in range(0, len(mat[0])):
-                #     res.append(GroupByContainer(m[i] for m in mat))
-                #     self._schema[i].set(res[-1])
-                # return res
-
-        def itervalues():
+        aggs = [c for c in schema if isinstance(c, ColumnGroupType)]
+        firsts = [c for c in schema if not isinstance(c, ColumnGroupType)]
+        naggs = len(aggs)
+        if having is not None:
+            if not isinstance(having, ColumnType):
+                raise IterException(
+                    "expecting a ColumnType here not: {0}".format(str(having)))
+            self._check_having(having, set(id(c) for c in nochange))
+            # aggregated columns only used by the condition
+            ids = set(id(c) for c in aggs)
+            for c in self._group_columns(having):
+                if id(c) not in ids:
+                    ids.add(id(c))
+                    aggs.append(c)
+            having_inputs = list(nochange) + aggs
+            check_having = CompiledColumns(
+                [having], having_inputs, as_dict=False).function(False)
+
+        # per row, the function returns the values of the columns which are not
+        # aggregated followed by the distinct values the aggregated columns receive,
+        # all accumulators of a group are updated by a single function
+        ops = [c._opgr for c in aggs]
+        agg_inputs, positions = distinct_expressions(
+            [c.Parent[0] for c in aggs], self._schema)
+        compiled = CompiledColumns(firsts + agg_inputs,
+                                   self._schema, as_dict=False)
+        nfirsts = len(firsts)
+        init_states, update_states = compile_accumulators(
+            ops, [p + nfirsts for p in positions])
+
+        def to_row(first, states):
+            final = [op.finalize(st) for op, st in zip(ops, states)]
+            if having is not None and \
+                    not check_having(first[:len(nochange)] + tuple(final))[0]:
+                return None
+            res = {}
+            for col, v in zip(firsts, first):
+                col.set(v)
+                res[col.Name] = v
+            for col, v in zip(aggs[:naggs], final):
+                res[col.Name] = v
+            if as_dict:
+                return {c.Name: res[c.Name] for c in schema}
+            return tuple(res[c.Name] for c in schema)
+
+        def keyed_values():
             colsi = None
+            fdict = None
+            ftuple = None
             for row in self._thisset:
                 if isinstance(row, dict):
                     for col in self._schema:
                         col.set(row[col.Name])
                     key = tuple(row[k.Name] for k in nochange)
+                    if fdict is None:
+                        fdict = compiled.function(True)
+                    values = fdict(row)
                 else:
                     for col, r in zip(self._schema, row):
                         col.set(r)
@@ -447,45 +741,75 @@ class IterRow:
                                 self._schema,
                                 k.Name) for k in nochange]
                     key = tuple(row[k] for k in colsi)
+                    if ftuple is None:
+                        ftuple = compiled.function(False)
+                    values = ftuple(row)
+                yield key, values
 
-                if as_dict:
-                    yield key, NoSortClass({_.Name: _() for _ in schema})
-                else:
-                    yield key, NoSortClass(tuple([_() for _ in schema]))
+        def new_group(item):
+            grp = (item[1][:nfirsts], init_states())
+            update_states(grp[1], item[1])
+            return grp
+
+        def merge_groups(grp, other):
+            return (grp[0], [op.merge(a, b) for op, a, b in zip(ops, grp[1], other[1])])
 
         def itervalues_group():
-            current = []
-            keycur = None
-            for key, row in sorted(itervalues()):
-                if key != keycur:
-                    if len(current) > 0:
-                        tom = to_matrix(current)
-                        yield tom
-                    current = [row.value]
-                    keycur = key
-                else:
-                    current.append(row.value)
-            if len(current) > 0:
-                tom = to_matrix(current)
-                yield tom
+            if n_jobs is not None:
+                groups = parallel_aggregate(
+                    keyed_values(), ops, [p + nfirsts for p in positions], nfirsts,
+                    n_jobs=n_jobs, executor=executor)
+            elif memory_limit is None:
+                groups = {}
+                for key, values in keyed_values():
+                    grp = groups.get(key)
+                    if grp is None:
+                        grp = groups[key] = (values[:nfirsts], init_states())
+                    update_states(grp[1], values)
+                groups = groups.items()
+            else:
+                groups = external_aggregate(
+                    keyed_values(), key=itemgetter(0), init=new_group,
+                    update=lambda grp, item: update_states(grp[1], item[1]),
+                    merge=merge_groups, memory_limit=memory_limit)
+            if sort_keys:
+                groups = external_sort(groups, key=itemgetter(0),
+                                       memory_limit=memory_limit)
+            for key, grp in groups:
+                row = to_row(*grp)
+                if row is not None:
+                    yield row
 
         tbl = IterRow(schema, anyset=itervalues_group(), as_dict=as_dict)
         for c in schema:
             c.set_owner(tbl)
+        tbl._plan = dict(op="groupby", inputs=(self,), schema=schema,
+                         keys=[k.Name for k in nochange], sort_keys=sort_keys,
+                         having=having, memory_limit=memory_limit, n_jobs=n_jobs)
         return tbl
 
-    def unionall(self, iter, merge_schema=False, as_dict=True):
+    def groupby_sets(self, sets, as_dict=True, sort_keys=True, **changed):
         """
-        Concatenates this table with another one
+        Applies several groupby at once (same behavior as SQL's ``GROUPING SETS``).
 
-        @param      iter            IterRow
-        @param      merge_schema    if False, the function expects you find the same schema,
-                                    otherwise, it merges them (same column name are not duplicated)
-        @param      as_dict         returns results as a list of dictionaries [ { "colname": value, ... } ]
-        @return                     IterRow
+        @param      sets        list of grouping sets, every set is a list of columns
+        @param      changed     list of aggregated columns (see @see cl ColumnGroupType)
+        @param      as_dict     returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @param      sort_keys   sort the groups of every set by keys, otherwise,
+                                the groups follow the order of their first row
+        @return                 IterRow
+
+        The results contain every column of every grouping set followed
+        by the aggregated columns, a column which is not part of a grouping set is @see cl NA.
+        The groups of the first set are returned first, then the groups of the second set...
+
+        The table is read only once: the rows are aggregated by all the key columns
+        (the finest grouping), every grouping set is then computed by merging the
+        accumulators (see @see cl ColumnGroupOperator) of the smallest grouping
+        already computed which contains it, the rows are never read again.
 
         .. exref::
-            :title: union all
+            :title: grouping sets
 
             ::
 
@@ -494,26 +818,269 @@ class IterRow:
                         {"nom":"jeanne", "age":2, "gender":"F"} ]
                 tbl = IterRow (None, l)
 
-                iter = tbl.unionall(tbl)
+                iter = tbl.groupby_sets([[tbl.gender, tbl.nom], [tbl.gender], []],
+                                        sum_age=tbl.age.sum())
+        """
+        keys = []
+        for gset in sets:
+            for el in gset:
+                if not isinstance(el, ColumnType):
+                    raise IterException(
+                        "expecting a ColumnType here not: {0}".format(
+                            str(el)))
+                if el._owner != self:
+                    raise IterException(
+                        "mismatch: all columns should belong to this view, check all columns come from this instance")
+                if el.Name not in [k.Name for k in keys]:
+                    keys.append(el)
+        knames = [k.Name for k in keys]
+        set_pos = [tuple(sorted(set(knames.index(el.Name) for el in gset)))
+                   for gset in sets]
+
+        aggs = []
+        for k, v in changed.items():
+            if not isinstance(v, ColumnGroupType):
+                raise IterException(
+                    "expecting an aggregated column here not: {0}-{1}".format(type(v), str(v)))
+            v.set_name(k)
+            aggs.append(v)
+
+        schema = [v.copy(None)
+                  for v in keys]  # we do not know the owner yet
+        schema.extend(aggs)
+
+        ops = [c._opgr for c in aggs]
+        agg_inputs, positions = distinct_expressions(
+            [c.Parent[0] for c in aggs], self._schema)
+        compiled = CompiledColumns(agg_inputs, self._schema, as_dict=False)
+        init_states, update_states = compile_accumulators(ops, positions)
+        getkey = key_getter([self._findschema(self._schema, n) for n in knames]) \
+            if knames else (lambda row: ())
+
+        def merge_level(groups, sel):
+            # aggregates the groups of a finer level
+            coarse = {}
+            for key, states in groups.items():
+                ckey = tuple(key[i] for i in sel)
+                cur = coarse.get(ckey)
+                if cur is None:
+                    coarse[ckey] = [op.merge(op.init(), st)
+                                    for op, st in zip(ops, states)]
+                else:
+                    for j, op in enumerate(ops):
+                        cur[j] = op.merge(cur[j], states[j])
+            return coarse
+
+        def itervalues():
+            fvalues = compiled.function(False)
+            finest = tuple(range(len(knames)))
+            groups = {}
+            for row in self._iter_tuples():
+                key = getkey(row)
+                states = groups.get(key)
+                if states is None:
+                    states = groups[key] = init_states()
+                update_states(states, fvalues(row))
+
+            levels = {finest: groups}
+            for pos in sorted(set(set_pos), key=len, reverse=True):
+                if pos in levels:
+                    continue
+                # the smallest level computed so far which contains this one
+                parent = min((p for p in levels if set(pos) <= set(p)),
+                             key=lambda p: len(levels[p]))
+                levels[pos] = merge_level(
+                    levels[parent], [parent.index(i) for i in pos])
+            if not groups and () in levels:
+                # SQL returns one row for the empty grouping set
+                levels[()] = {(): init_states()}
+
+            na = NA()
+            for pos in set_pos:
+                level = levels[pos]
+                for key in (sorted(level) if sort_keys else level):
+                    values = [na] * len(knames)
+                    for i, v in zip(pos, key):
+                        values[i] = v
+                    values.extend(op.finalize(st)
+                                  for op, st in zip(ops, level[key]))
+                    if as_dict:
+                        yield {c.Name: v for c, v in zip(schema, values)}
+                    else:
+                        yield tuple(values)
+
+        tbl = IterRow(schema, anyset=itervalues(), as_dict=as_dict)
+        for c in schema:
+            c.set_owner(tbl)
+        tbl._plan = dict(op="groupby_sets", inputs=(self,), schema=schema,
+                         sets=[[knames[i] for i in pos] for pos in set_pos],
+                         sort_keys=sort_keys)
+        return tbl
+
+    def rollup(self, *nochange, as_dict=True, sort_keys=True, **changed):
+        """
+        Applies a groupby on every prefix of the list of keys
+        (same behavior as SQL's ``ROLLUP``), ``rollup(a, b)`` is equivalent to
+        ``groupby_sets([[a, b], [a], []])``, see @see me groupby_sets.
+
+        @param      nochange    list of keys
+        @param      changed     list of aggregated columns (see @see cl ColumnGroupType)
+        @param      as_dict     returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @param      sort_keys   sort the groups of every set by keys
+        @return                 IterRow
+        """
+        sets = [list(nochange[:i]) for i in range(len(nochange), -1, -1)]
+        return self.groupby_sets(sets, as_dict=as_dict, sort_keys=sort_keys, **changed)
+
+    def cube(self, *nochange, as_dict=True, sort_keys=True, **changed):
+        """
+        Applies a groupby on every subset of the list of keys
+        (same behavior as SQL's ``CUBE``), ``cube(a, b)`` is equivalent to
+        ``groupby_sets([[a, b], [a], [b], []])``, see @see me groupby_sets.
+
+        @param      nochange    list of keys
+        @param      changed     list of aggregated columns (see @see cl ColumnGroupType)
+        @param      as_dict     returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @param      sort_keys   sort the groups of every set by keys
+        @return                 IterRow
+        """
+        sets = [list(c) for n in range(len(nochange), -1, -1)
+                for c in combinations(nochange, n)]
+        return self.groupby_sets(sets, as_dict=as_dict, sort_keys=sort_keys, **changed)
+
+    def window(self, partition_by=None, order_by=None, as_dict=True, ascending=True,
+               memory_limit=None, **changed):
+        """
+        Adds window functions to every row (same behavior as SQL's
+        ``OVER (PARTITION BY ... ORDER BY ...)``).
+
+        @param      partition_by    column or list of columns, None for a single partition
+        @param      order_by        column or list of columns the rows of a partition are sorted by
+        @param      as_dict         returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @param      ascending       order (partitions and rows)
+        @param      memory_limit    memory budget in bytes for the sort, None for no limit
+        @param      changed         window columns, see @see cl ColumnWindowType,
+                                    an aggregated column (see @see cl ColumnGroupType)
+                                    is computed on all the previous rows of the partition
+        @return                     IterRow
+
+        The rows are sorted by *partition_by* then by *order_by*
+        as @see me orderby does, the sort is skipped if the table is already sorted
+        (see @see me declare_sorted). Every partition is then read once, row after row:
+        every window column updates its state (see @see cl ColumnWindowOperator),
+        a frame ``ROWS BETWEEN n PRECEDING AND CURRENT ROW``
+        removes the value leaving the frame instead of computing the whole frame again.
+        The results contain all columns of this table followed by the window columns.
 
         .. exref::
-            :title: union all with different schema
+            :title: window functions
 
             ::
 
-                l = [   { "nom":"j", "age": 10, "gender":"M"} ,
-                        {"nom":"jean", "age":40, "gender":"M"},
-                        {"nom":"jeanne", "age":2, "gender":"F"} ]
+                l = [   { "nom":"j", "day": 1, "amount": 10} ,
+                        {"nom":"j", "day":2, "amount": 5},
+                        {"nom":"jean", "day":1, "amount": 2} ]
                 tbl = IterRow (None, l)
 
-                l = [   { "nom":"j", "newage": 10, "gender":"M"} ,
-                        {"nom":"jean", "newage":40, "gender":"M"},
-                        {"nom":"jeanne", "newage":2, "gender":"F"} ]
-                tbl2 = IterRow (None, l)
+                iter = tbl.window(partition_by=tbl.nom, order_by=tbl.day,
+                                  total=tbl.amount.cumsum(),
+                                  prev=tbl.amount.lag(),
+                                  avg3=tbl.amount.avg().over(preceding=2),
+                                  rn=tbl.day.row_number())
+        """
+        def to_list(cols):
+            if cols is None:
+                return []
+            if not isinstance(cols, (list, tuple)):
+                cols = [cols]
+            for el in cols:
+                if not isinstance(el, ColumnType):
+                    raise IterException(
+                        "expecting a ColumnType here not: {0}".format(
+                            str(el)))
+                if el._owner != self:
+                    raise IterException(
+                        "mismatch: all columns should belong to this view, check all columns come from this instance")
+            return [el.Name for el in cols]
 
-                iter = tbl.unionall(tbl2, merge_schema = True)
+        partition_by = to_list(partition_by)
+        order_by = to_list(order_by)
+        wins = []
+        for k, v in changed.items():
+            if isinstance(v, ColumnGroupType):
+                v = v.over()
+            if not isinstance(v, ColumnWindowType):
+                raise IterException(
+                    "expecting a window column here not: {0}-{1}".format(type(v), str(v)))
+            v.set_name(k)
+            wins.append(v)
+
+        schema = [v.copy(None)
+                  for v in self._schema]  # we do not know the owner yet
+        schema.extend(wins)
+        names = [c.Name for c in self._schema]
+        if len(set(c.Name for c in schema)) < len(schema):
+            raise IterException(
+                "some columns share the same name: " + str(schema))
+
+        ops = [c._opwin for c in wins]
+        win_inputs, positions = distinct_expressions(
+            [c.Parent[0] for c in wins], self._schema)
+        compiled = CompiledColumns(win_inputs, self._schema, as_dict=False)
+        keys = partition_by + order_by
+        order = self._sort_order()
+        presorted = len(keys) == 0 or (
+            order is not None and order[1] == ascending and order[0][:len(keys)] == keys)
+        getpart = itemgetter(*[names.index(k) for k in partition_by]) \
+            if partition_by else None
+        getorder = key_getter([names.index(k) for k in order_by]) \
+            if order_by else (lambda row: ())
+
+        def itervalues():
+            rows = self._iter_tuples()
+            if not presorted:
+                rows = external_sort(rows, key=key_getter([names.index(k) for k in keys]),
+                                     reverse=not ascending, memory_limit=memory_limit)
+            fvalues = compiled.function(False)
+            part = None
+            states = None
+            for row in rows:
+                if states is None or (getpart is not None and getpart(row) != part):
+                    part = None if getpart is None else getpart(row)
+                    states = [op.start() for op in ops]
+                values = fvalues(row)
+                key = getorder(row)
+                out = tuple(op.step(st, values[p], key)
+                            for op, st, p in zip(ops, states, positions))
+                for col, v in zip(wins, out):
+                    col.set(v)
+                if as_dict:
+                    res = dict(zip(names, row))
+                    res.update(zip([c.Name for c in wins], out))
+                    yield res
+                else:
+                    yield row + out
+
+        tbl = IterRow(schema, anyset=itervalues(), as_dict=as_dict)
+        for c in schema:
+            c.set_owner(tbl)
+        tbl._plan = dict(op="window", inputs=(self,), schema=schema,
+                         partition_by=partition_by, order_by=order_by,
+                         ascending=ascending, memory_limit=memory_limit,
+                         presorted=presorted)
+        return tbl
+
+    def _union_schema(self, iter, merge_schema):
         """
+        Returns the schema of the concatenation of two tables,
+        used by @see me unionall, @see me union, @see me intersect, @see me except_.
 
+        @param      iter            IterRow
+        @param      merge_schema    see @see me unionall
+        @return                     schema (copies of the columns without owner),
+                                    set of column names missing in this table,
+                                    set of column names missing in *iter*
+        """
         if merge_schema:
             names = set(a.Name for a in self._schema)
             name2 = set(a.Name for a in iter._schema)
@@ -538,7 +1105,7 @@ class IterRow:
                 c.Name for c in self._schema if c.Name not in common)
 
         else:
-            if len(self._schema) != len(self._schema):
+            if len(self._schema) != len(iter._schema):
                 raise SchemaException(
                     "cannot concatenate, different schema length")
             names = sorted(a.Name for a in self._schema)
@@ -556,6 +1123,50 @@ class IterRow:
             not_in_self = set()
             not_in_iter = set()
 
+        return schema, not_in_self, not_in_iter
+
+    def unionall(self, iter, merge_schema=False, as_dict=True):
+        """
+        Concatenates this table with another one
+
+        @param      iter            IterRow
+        @param      merge_schema    if False, the function expects you find the same schema,
+                                    otherwise, it merges them (same column name are not duplicated)
+        @param      as_dict         returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @return                     IterRow
+
+        .. exref::
+            :title: union all
+
+            ::
+
+                l = [   { "nom":"j", "age": 10, "gender":"M"} ,
+                        {"nom":"jean", "age":40, "gender":"M"},
+                        {"nom":"jeanne", "age":2, "gender":"F"} ]
+                tbl = IterRow (None, l)
+
+                iter = tbl.unionall(tbl)
+
+        .. exref::
+            :title: union all with different schema
+
+            ::
+
+                l = [   { "nom":"j", "age": 10, "gender":"M"} ,
+                        {"nom":"jean", "age":40, "gender":"M"},
+                        {"nom":"jeanne", "age":2, "gender":"F"} ]
+                tbl = IterRow (None, l)
+
+                l = [   { "nom":"j", "newage": 10, "gender":"M"} ,
+                        {"nom":"jean", "newage":40, "gender":"M"},
+                        {"nom":"jeanne", "newage":2, "gender":"F"} ]
+                tbl2 = IterRow (None, l)
+
+                iter = tbl.unionall(tbl2, merge_schema = True)
+        """
+
+        schema, not_in_self, not_in_iter = self._union_schema(iter, merge_schema)
+
         not_in_self = [iter._findschema(iter._schema, c) for c in not_in_self]
         not_in_iter = [self._findschema(self._schema, c) for c in not_in_iter]
 
@@ -593,4 +1204,783 @@ class IterRow:
         tbl = IterRow(schema, anyset=iter_union(), as_dict=as_dict)
         for c in schema:
             c.set_owner(tbl)
+        tbl._plan = dict(op="unionall", inputs=(self, iter), schema=schema)
+        return tbl
+
+    def _union_many_schema(self, iters, merge_schema):
+        """
+        Returns the schema of the concatenation of this table with many others,
+        used by @see me unionall_many and @see me merge_sorted.
+
+        @param      iters           list of IterRow
+        @param      merge_schema    see @see me unionall_many
+        @return                     schema (copies of the columns without owner)
+        """
+        if merge_schema:
+            schema = [c.copy(None) for c in self._schema]
+            names = set(c.Name for c in schema)
+            for tbl in iters:
+                for c in tbl._schema:
+                    if c.Name not in names:
+                        schema.append(c.copy(None))
+                        names.add(c.Name)
+        else:
+            for tbl in iters:
+                self._union_schema(tbl, False)
+            schema = [c.copy(None) for c in self._schema]
+        return schema
+
+    def unionall_many(self, iters, merge_schema=False, as_dict=True,
+                      concurrent=False, max_workers=None):
+        """
+        Concatenates this table with many others in a single operator,
+        it is equivalent to ``tbl.unionall(t1).unionall(t2)...``
+        without the intermediate tables.
+
+        @param      iters           list of IterRow
+        @param      merge_schema    if False, the function expects you find the same schema,
+                                    otherwise, it merges them (same column name are not duplicated,
+                                    columns appear in the order they are found), a missing
+                                    column is @see cl NA
+        @param      as_dict         returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @param      concurrent      reads the tables in background threads,
+                                    the rows are returned as they come
+        @param      max_workers     maximum number of threads (None for one thread per table)
+        @return                     IterRow
+
+        By default, the tables are read one after the other.
+        If *concurrent* is True, every table is read by a thread which sends
+        rows to the main one by chunks (see @see fn concurrent_chain),
+        the order of the rows coming from one table is kept but rows from
+        different tables are mixed. It is useful if the tables are read from files
+        or any other slow source, :epkg:`Python` code does not run faster with threads.
+
+        .. exref::
+            :title: union all of many tables
+
+            ::
+
+                tbls = [ IterRow(None, l) for l in partitions ]
+                iter = tbls[0].unionall_many(tbls[1:])
+        """
+        tables = [self] + list(iters)
+        schema = self._union_many_schema(tables[1:], merge_schema)
+        names = [c.Name for c in schema]
+        na = NA()
+
+        def itervalues():
+            sources = [tbl._aligned_tuples(names, na) for tbl in tables]
+            if concurrent:
+                rows = concurrent_chain(sources, max_workers=max_workers)
+            else:
+                rows = chain.from_iterable(sources)
+            try:
+                for row in rows:
+                    if as_dict:
+                        yield dict(zip(names, row))
+                    else:
+                        yield row
+            finally:
+                if concurrent:
+                    rows.close()
+
+        tbl = IterRow(schema, anyset=itervalues(), as_dict=as_dict)
+        for c in schema:
+            c.set_owner(tbl)
+        tbl._plan = dict(op="unionall_many", inputs=tuple(tables), schema=schema,
+                         concurrent=concurrent)
+        return tbl
+
+    def merge_sorted(self, iters, key=None, ascending=None, merge_schema=False,
+                     as_dict=True):
+        """
+        Concatenates this table with many others, every table is sorted by the same key,
+        the result is sorted too. It is equivalent to
+        ``tbl.unionall_many(iters).orderby(*key)`` but the function
+        does not sort again: it keeps the current row of every table in a heap
+        (see :epkg:`heapq`), the cost is *O(n log k)* for *k* tables.
+
+        @param      iters           list of IterRow
+        @param      key             list of columns or column names the tables are sorted by,
+                                    None to use the order known by every table
+                                    (see @see me orderby, @see me declare_sorted)
+        @param      ascending       order, None to use the order known by every table,
+                                    True if it is unknown
+        @param      merge_schema    see @see me unionall_many
+        @param      as_dict         returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @return                     IterRow
+
+        The function does not check the tables are sorted.
+        Two rows sharing the same key are returned in the order of the tables.
+
+        .. exref::
+            :title: merge sorted tables
+
+            ::
+
+                tbls = [ IterRow(None, l) for l in partitions ]
+                tbls = [ t.orderby(t.age) for t in tbls ]
+                iter = tbls[0].merge_sorted(tbls[1:])
+        """
+        tables = [self] + list(iters)
+        orders = [tbl._sort_order() for tbl in tables]
+        if key is None:
+            if any(o is None for o in orders):
+                raise SchemaException(
+                    "key must be specified, the order of one table is unknown")
+            keys = orders[0][0]
+            for o in orders[1:]:
+                n = min(len(keys), len(o[0]))
+                if o[0][:n] != keys[:n]:
+                    raise SchemaException(
+                        "tables are not sorted by the same key: {0} != {1}".format(
+                            keys, o[0]))
+                keys = keys[:n]
+        else:
+            if not isinstance(key, list):
+                key = [key]
+            keys = [k.Name if isinstance(k, ColumnType) else k for k in key]
+        if ascending is None:
+            known = set(o[1] for o in orders if o is not None)
+            if len(known) > 1:
+                raise SchemaException("tables are not sorted in the same order")
+            ascending = known.pop() if known else True
+
+        schema = self._union_many_schema(tables[1:], merge_schema)
+        names = [c.Name for c in schema]
+        for k in keys:
+            if k not in names:
+                raise SchemaException(
+                    "unable to find column {0} in schema {1}".format(k, names))
+        getkey = key_getter([names.index(k) for k in keys])
+        na = NA()
+
+        def itervalues():
+            sources = [tbl._aligned_tuples(names, na) for tbl in tables]
+            for row in heapq.merge(*sources, key=getkey, reverse=not ascending):
+                if as_dict:
+                    yield dict(zip(names, row))
+                else:
+                    yield row
+
+        tbl = IterRow(schema, anyset=itervalues(), as_dict=as_dict)
+        for c in schema:
+            c.set_owner(tbl)
+        tbl._plan = dict(op="merge_sorted", inputs=tuple(tables), schema=schema,
+                         keys=keys, ascending=ascending)
+        return tbl
+
+    def _aligned_tuples(self, names, na):
+        """
+        iterates on the rows of this table, every row is a tuple
+        following *names*, a missing column is replaced by *na*
+        """
+        present = [n for n in names if n in self.__dict__ and
+                   isinstance(self.__dict__[n], ColumnType)]
+        if len(present) == len(names):
+            yield from self._iter_tuples(names)
+            return
+        for row in self._iter_tuples(present):
+            values = dict(zip(present, row))
+            yield tuple(values.get(n, na) for n in names)
+
+    def _set_operation(self, iter, op, merge_schema, as_dict, memory_limit):
+        """
+        implements @see me union, @see me intersect, @see me except_
+        """
+        schema, _, __ = self._union_schema(iter, merge_schema)
+        names = [c.Name for c in schema]
+        na = NA()
+
+        def itervalues():
+            if op == "union":
+                rows = chain(self._aligned_tuples(names, na),
+                             iter._aligned_tuples(names, na))
+            else:
+                keys = set(iter._aligned_tuples(names, na))
+                rows = self._aligned_tuples(names, na)
+                if op == "intersect":
+                    rows = (row for row in rows if row in keys)
+                else:
+                    rows = (row for row in rows if row not in keys)
+            for row in external_distinct(rows, memory_limit=memory_limit):
+                if as_dict:
+                    yield dict(zip(names, row))
+                else:
+                    yield row
+
+        tbl = IterRow(schema, anyset=itervalues(), as_dict=as_dict)
+        for c in schema:
+            c.set_owner(tbl)
+        tbl._plan = dict(op=op, inputs=(self, iter), schema=schema,
+                         memory_limit=memory_limit)
+        return tbl
+
+    def union(self, iter, merge_schema=False, as_dict=True, memory_limit=None):
+        """
+        Concatenates this table with another one and removes duplicated rows
+        (same behavior as SQL's ``UNION``).
+
+        @param      iter            IterRow
+        @param      merge_schema    see @see me unionall
+        @param      as_dict         returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @param      memory_limit    memory budget in bytes for the rows already returned, None for no limit
+        @return                     IterRow
+
+        The schema is the same as the one @see me unionall returns,
+        a missing column is @see cl NA (all missing values of the results are equal).
+        Both tables are read once, the first occurrence of every row is returned
+        as soon as it is read (see @see me distinct for *memory_limit*).
+
+        .. exref::
+            :title: union
+
+            ::
+
+                l = [   { "nom":"j", "age": 10, "gender":"M"} ,
+                        {"nom":"jean", "age":40, "gender":"M"},
+                        {"nom":"jeanne", "age":2, "gender":"F"} ]
+                tbl = IterRow (None, l)
+
+                iter = tbl.union(tbl)
+        """
+        return self._set_operation(iter, "union", merge_schema, as_dict, memory_limit)
+
+    def intersect(self, iter, merge_schema=False, as_dict=True, memory_limit=None):
+        """
+        Returns the distinct rows of this table which also appear
+        in another table (same behavior as SQL's ``INTERSECT``).
+
+        @param      iter            IterRow
+        @param      merge_schema    see @see me unionall
+        @param      as_dict         returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @param      memory_limit    memory budget in bytes for the rows already returned, None for no limit
+        @return                     IterRow
+
+        The rows of *iter* are stored in a set, this table is read once
+        and is never stored.
+        """
+        return self._set_operation(iter, "intersect", merge_schema, as_dict, memory_limit)
+
+    def except_(self, iter, merge_schema=False, as_dict=True, memory_limit=None):
+        """
+        Returns the distinct rows of this table which do not appear
+        in another table (same behavior as SQL's ``EXCEPT``).
+
+        @param      iter            IterRow
+        @param      merge_schema    see @see me unionall
+        @param      as_dict         returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @param      memory_limit    memory budget in bytes for the rows already returned, None for no limit
+        @return                     IterRow
+
+        The rows of *iter* are stored in a set, this table is read once
+        and is never stored.
+        """
+        return self._set_operation(iter, "except", merge_schema, as_dict, memory_limit)
+
+    def distinct(self, *nochange, as_dict=True, memory_limit=None):
+        """
+        Removes duplicated rows (same behavior as SQL's ``SELECT DISTINCT``).
+
+        @param      nochange        list of columns to keep, all columns if empty
+        @param      as_dict         returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @param      memory_limit    memory budget in bytes for the rows already seen, None for no limit
+        @return                     IterRow
+
+        The function returns the first occurrence of every row as soon as it reads it,
+        the rows already returned are stored in a set.
+        If the set exceeds *memory_limit*, the new rows are stored in temporary files
+        (see @see fn external_distinct) and the order is not kept for them.
+
+        .. exref::
+            :title: distinct
+
+            ::
+
+                l = [   { "nom":"j", "age": 10, "gender":"M"} ,
+                        {"nom":"jean", "age":40, "gender":"M"},
+                        {"nom":"jeanne", "age":2, "gender":"F"} ]
+                tbl = IterRow (None, l)
+
+                iter = tbl.distinct(tbl.gender)
+        """
+        for el in nochange:
+            if not isinstance(el, ColumnType):
+                raise IterException(
+                    "expecting a ColumnType here not: {0}".format(
+                        str(el)))
+            if el._owner != self:
+                raise IterException(
+                    "mismatch: all columns should belong to this view, check all columns come from this instance")
+        if len(nochange) == 0:
+            nochange = self._schema
+
+        schema = [v.copy(None)
+                  for v in nochange]  # we do not know the owner yet
+        names = [c.Name for c in schema]
+
+        def itervalues():
+            rows = external_distinct(self._iter_tuples(names),
+                                     memory_limit=memory_limit)
+            for row in rows:
+                if as_dict:
+                    yield dict(zip(names, row))
+                else:
+                    yield row
+
+        tbl = IterRow(schema, anyset=itervalues(), as_dict=as_dict)
+        for c in schema:
+            c.set_owner(tbl)
+        tbl._plan = dict(op="distinct", inputs=(self,), schema=schema,
+                         memory_limit=memory_limit)
+        return tbl
+
+    def _iter_tuples(self, names=None, rows=None):
+        """
+        iterates on the rows of this table, every row is a tuple
+        (values follow the schema order)
+
+        @param      names       only returns these columns (None for all)
+        @param      rows        rows to read instead of the rows of this table
+                                (see @see me _filter_keys)
+        """
+        if rows is None:
+            if self._thisset is None:
+                raise IterException("this class contains no iterator")
+            rows = self._thisset
+        if names is None:
+            names = [c.Name for c in self._schema]
+            pos = None
+        else:
+            pos = [self._findschema(self._schema, n) for n in names]
+        for row in rows:
+            if isinstance(row, dict):
+                yield tuple(row[n] for n in names)
+            elif pos is None:
+                yield tuple(row)
+            else:
+                yield tuple(row[i] for i in pos)
+
+    def _join_keys(self, other, on):
+        """
+        returns the positions of the key columns in both tables
+
+        @param      other       IterRow
+        @param      on          a column name, a column, a pair *(left, right)*
+                                or a list of them
+        @return                 two lists of positions
+        """
+        if not isinstance(on, list):
+            on = [on]
+        if len(on) == 0:
+            raise SchemaException("on cannot be empty")
+        lpos, rpos = [], []
+        for item in on:
+            if isinstance(item, tuple):
+                if len(item) != 2:
+                    raise SchemaException(
+                        "a key must be a pair (left, right) not {0}".format(item))
+                left, right = item
+            else:
+                left, right = item, item
+            for side, tbl, pos in [(left, self, lpos), (right, other, rpos)]:
+                name = side.Name if isinstance(side, ColumnType) else side
+                try:
+                    pos.append(tbl._findschema(tbl._schema, name))
+                except IndexError:
+                    raise SchemaException(
+                        "unable to find column {0} in schema {1}".format(
+                            name, tbl)) from None
+        return lpos, rpos
+
+    def _pushdown_node(self, names):
+        """
+        Walks through the operators which produced this table and
+        returns the first table whose rows can be filtered on the columns
+        *names* without changing the rows of this table:
+        the columns must be copied without any change by every select,
+        where and orderby (without limit) keep all the rows they do not remove.
+
+        @param      names       column names
+        @return                 ``(IterRow, column names in this table)``
+        """
+        node = self
+        while True:
+            plan = node._plan
+            if plan is None or plan["op"] not in ("select", "where", "orderby"):
+                return node, names
+            if plan["op"] == "orderby" and plan["limit"] is not None:
+                return node, names
+            child = plan["inputs"][0]
+            if plan["op"] == "select":
+                ids = set(id(c) for c in child._schema)
+                new_names = []
+                for n in names:
+                    col = plan["schema"][node._findschema(plan["schema"], n)]
+                    if not isinstance(col._op, OperatorId) or len(col._parent) != 1 or \
+                            id(col._parent[0]) not in ids:
+                        return node, names
+                    new_names.append(col._parent[0].Name)
+                names = new_names
+            node = child
+
+    def _filter_keys(self, node, names, keys):
+        """
+        Returns an iterator on the rows of this table computed
+        from the rows of *node* whose values for columns *names* belong to *keys*.
+        The operators between *node* and this table (see @see me _pushdown_node)
+        are applied again on the filtered rows, no table is modified.
+
+        @param      node        IterRow this table is built on
+        @param      names       column names in *node*
+        @param      keys        set of tuples (or any container)
+        @return                 iterator on rows
+        """
+        if node._thisset is None:
+            raise IterException("this class contains no iterator")
+        path = []
+        tbl = self
+        while tbl is not node:
+            path.append(tbl)
+            tbl = tbl._plan["inputs"][0]
+        pos = [node._findschema(node._schema, n) for n in names]
+
+        def itervalues():
+            for row in node._thisset:
+                if isinstance(row, dict):
+                    key = tuple(row[n] for n in names)
+                else:
+                    key = tuple(row[i] for i in pos)
+                if key in keys:
+                    yield row
+
+        rows = itervalues()
+        for tbl in reversed(path):
+            rows = tbl._plan["rows"](rows)
+        return rows
+
+    def join(self, other, on, how="inner", as_dict=True, build=None,
+             memory_limit=None, algorithm=None):
+        """
+        Joins this table with another one (same behavior as SQL's JOIN).
+
+        @param      other           IterRow
+        @param      on              key, a column name, a column, a pair *(left column, right column)*
+                                    or a list of them
+        @param      how             ``'inner'``, ``'left'``, ``'right'``, ``'full'``
+        @param      as_dict         returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @param      build           side the hash table is built on (``'left'`` or ``'right'``),
+                                    None to choose the smaller one if both sizes are known,
+                                    the right side otherwise
+        @param      memory_limit    memory budget in bytes for the build side, None for no limit
+        @param      algorithm       ``'hash'``, ``'merge'``, None to let the function choose
+        @return                     IterRow
+
+        The schema is merged as @see me unionall does with ``merge_schema=True``:
+        a column name present in both tables appears once, its value comes from the
+        left table unless the left row is missing. Columns of the left table come first.
+        Missing values of an outer join are @see cl NA. A key containing None
+        does not match anything. The join is done by @see fn hash_join,
+        only the build side is stored in memory.
+        If *memory_limit* is specified and the build side exceeds it,
+        both tables are partitioned into temporary files and joined
+        partition by partition (see @see fn grace_hash_join),
+        the rows are the same but the order may change.
+        If both tables are sorted by the key (they come from @see me orderby
+        or the order was declared with @see me declare_sorted), the function
+        uses a sort-merge join instead (see @see fn merge_join): it reads both
+        tables in lockstep and only stores the right rows sharing the same key.
+        When the rows of the probe side without a match are not returned
+        (inner join, right join built on the right side,
+        left join built on the left side), the keys of the hash table are used to filter
+        the probe side as early as possible: the filter is inserted after
+        the first table (the source) if the key goes through every select,
+        where or orderby unchanged, the rows which cannot match are removed before
+        any expression is evaluated (see @see me Plan, ``pushdown``).
+
+        .. exref::
+            :title: join
+
+            ::
+
+                l = [   { "nom":"j", "age": 10, "gender":"M"} ,
+                        {"nom":"jean", "age":40, "gender":"M"},
+                        {"nom":"jeanne", "age":2, "gender":"F"} ]
+                tbl = IterRow (None, l)
+
+                l = [   { "gender":"M", "label": "male"},
+                        { "gender":"F", "label": "female"} ]
+                tbl2 = IterRow (None, l)
+
+                iter = tbl.join(tbl2, on="gender", how="left")
+        """
+        if how not in ("inner", "left", "right", "full"):
+            raise ValueError("unexpected value for how: {0}".format(how))
+        lpos, rpos = self._join_keys(other, on)
+        if build is None:
+            build = "right"
+            try:
+                if len(self._thisset) < len(other._thisset):
+                    build = "left"
+            except TypeError:
+                # at least one side is an iterator
+                pass
+        elif build not in ("left", "right"):
+            raise ValueError("build must be 'left' or 'right' not {0}".format(build))
+
+        lnames = [c.Name for c in self._schema]
+        rnames = [c.Name for c in other._schema]
+        lkeys = [lnames[i] for i in lpos]
+        rkeys = [rnames[i] for i in rpos]
+        lorder = self._sort_order()
+        rorder = other._sort_order()
+        sorted_inputs = lorder is not None and rorder is not None and \
+            lorder[1] == rorder[1] and \
+            lorder[0][:len(lkeys)] == lkeys and rorder[0][:len(rkeys)] == rkeys
+        if algorithm is None:
+            algorithm = "merge" if sorted_inputs else "hash"
+        elif algorithm not in ("hash", "merge"):
+            raise ValueError(
+                "algorithm must be 'hash' or 'merge' not {0}".format(algorithm))
+        ascending = lorder[1] if sorted_inputs else True
+        if algorithm == "hash" and memory_limit is not None:
+            algorithm = "grace"
+        if build == "right":
+            probe, probe_keys = self, lkeys
+            pushdown = how in ("inner", "right")
+        else:
+            probe, probe_keys = other, rkeys
+            pushdown = how in ("inner", "left")
+        pushdown = pushdown and algorithm != "merge"
+
+        schema = [c.copy(None) for c in self._schema]
+        schema.extend(c.copy(None) for c in other._schema if c.Name not in lnames)
+        names = [c.Name for c in schema]
+        # for every column, position in the left row and in the right row
+        positions = [(lnames.index(n) if n in lnames else None,
+                      rnames.index(n) if n in rnames else None)
+                     for n in names]
+
+        def combine(left, right):
+            values = []
+            for i, j in positions:
+                if left is not None and i is not None:
+                    values.append(left[i])
+                elif right is not None and j is not None:
+                    values.append(right[j])
+                else:
+                    values.append(na)
+            return values
+
+        na = NA()
+
+        # rows of the probe side filtered by the keys of the hash table
+        filtered = []
+
+        def on_build(table):
+            node, names = probe._pushdown_node(probe_keys)
+            if node is not probe:
+                filtered.append(probe._filter_keys(node, names, table))
+
+        def iter_side(tbl):
+            # the probe side is read once the hash table is built
+            yield from tbl._iter_tuples(
+                rows=filtered[0] if tbl is probe and filtered else None)
+
+        def iter_join():
+            if algorithm == "merge":
+                pairs = merge_join(self._iter_tuples(), other._iter_tuples(),
+                                   key_getter(lpos), key_getter(rpos), how=how,
+                                   ascending=ascending)
+            else:
+                pairs = grace_hash_join(iter_side(self), iter_side(other),
+                                        key_getter(lpos), key_getter(rpos), how=how,
+                                        build_left=build == "left",
+                                        memory_limit=memory_limit,
+                                        on_build=on_build if pushdown else None)
+            for left, right in pairs:
+                values = combine(left, right)
+                if as_dict:
+                    yield dict(zip(names, values))
+                else:
+                    yield tuple(values)
+
+        tbl = IterRow(schema, anyset=iter_join(), as_dict=as_dict)
+        for c in schema:
+            c.set_owner(tbl)
+        tbl._plan = dict(op="join", inputs=(self, other), schema=schema, how=how,
+                         left_keys=lkeys, right_keys=rkeys, algorithm=algorithm,
+                         ascending=ascending, build=build, memory_limit=memory_limit,
+                         pushdown=pushdown)
+        return tbl
+
+    def _filter_join(self, other, on, anti, as_dict):
+        """
+        implements @see me semijoin and @see me antijoin
+        """
+        lpos, rpos = self._join_keys(other, on)
+        rkeys = [other._schema[i].Name for i in rpos]
+        getkey = key_getter(lpos)
+        schema = [v.copy(None)
+                  for v in self._schema]  # we do not know the owner yet
+        names = [c.Name for c in schema]
+
+        def itervalues():
+            # only the keys of the other table are stored
+            keys = set(other._iter_tuples(rkeys))
+            for row in self._iter_tuples():
+                key = getkey(row)
+                found = not has_null(key) and key in keys
+                if found == anti:
+                    continue
+                for col, r in zip(self._schema, row):
+                    col.set(r)
+                if as_dict:
+                    yield dict(zip(names, row))
+                else:
+                    yield row
+
+        tbl = IterRow(schema, anyset=itervalues(), as_dict=as_dict)
+        for c in schema:
+            c.set_owner(tbl)
+        tbl._plan = dict(op="antijoin" if anti else "semijoin",
+                         inputs=(self, other), schema=schema,
+                         left_keys=[names[i] for i in lpos], right_keys=rkeys)
+        return tbl
+
+    def semijoin(self, other, on, as_dict=True):
+        """
+        Keeps the rows whose key appears in another table
+        (same behavior as SQL's ``WHERE key IN (SELECT key FROM other)``
+        or ``WHERE EXISTS``).
+
+        @param      other       IterRow
+        @param      on          key, same format as in @see me join
+        @param      as_dict     returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @return                 IterRow
+
+        The function only stores the set of keys of *other*,
+        its other columns are never kept. The schema is the schema of this table,
+        a row is returned once even if its key appears several times in *other*.
+        A key containing None does not match anything.
+
+        .. exref::
+            :title: semi join
+
+            ::
+
+                l = [   { "nom":"j", "age": 10, "gender":"M"} ,
+                        {"nom":"jean", "age":40, "gender":"M"},
+                        {"nom":"jeanne", "age":2, "gender":"F"} ]
+                tbl = IterRow (None, l)
+
+                l = [   { "gender":"M" } ]
+                tbl2 = IterRow (None, l)
+
+                iter = tbl.semijoin(tbl2, on="gender")
+        """
+        return self._filter_join(other, on, False, as_dict)
+
+    def antijoin(self, other, on, as_dict=True):
+        """
+        Keeps the rows whose key does not appear in another table
+        (same behavior as SQL's ``WHERE NOT EXISTS``).
+
+        @param      other       IterRow
+        @param      on          key, same format as in @see me join
+        @param      as_dict     returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @return                 IterRow
+
+        The function only stores the set of keys of *other*.
+        A key containing None does not match anything, the row is kept
+        (SQL's ``NOT IN`` would remove it).
+        """
+        return self._filter_join(other, on, True, as_dict)
+
+    def compile(self, as_dict=True):
+        """
+        Generates a single Python loop for the whole chain of operations
+        which produced this table (select, where, orderby, groupby, unionall).
+        The chain is read from @see me Plan, the function does not need
+        the source code of the function which built the chain.
+        A table produced by an operator the compiler does not handle is
+        read with the interpreted engine.
+
+        @param      as_dict     returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @return                 IterRow
+
+        The generated code is available in ``tbl.Plan["code"]``.
+
+        .. exref::
+            :title: compiled pipeline
+
+            ::
+
+                tbl = IterRow ( ... )
+                iter = tbl.select(tbl.nom, age2=tbl.age * 2)
+                wher = iter.where(iter.age2 > 20)
+                res = list(wher.compile())
+        """
+        schema = [v.copy(None)
+                  for v in self._schema]  # we do not know the owner yet
+        comp = PipelineCompiler(self)
+        fct = comp.compile()
+
+        tbl = IterRow(schema, anyset=fct(), as_dict=as_dict)
+        for c in schema:
+            c.set_owner(tbl)
+        tbl._plan = dict(op="compile", inputs=(self,), schema=schema,
+                         code=comp.Source)
+        return tbl
+
+    def iter_batches(self, batch_size=1000, use_numpy=False):
+        """
+        Iterates on the results by batches of rows. Operators select,
+        where, groupby and unionall exchange batches instead of rows
+        (see @see cl BatchExecutor).
+
+        @param      batch_size      number of rows in a batch
+        @param      use_numpy       stores numerical columns into :epkg:`numpy` arrays
+                                    and uses vectorized operators,
+                                    None to use :epkg:`numpy` if it is installed
+        @return                     iterator on dictionaries ``{ column name: list of values }``
+
+        .. exref::
+            :title: batches
+
+            ::
+
+                tbl = IterRow ( ... )
+                iter = tbl.select(tbl.nom, age2=tbl.age * 2)
+                for batch in iter.iter_batches(batch_size=1000):
+                    print(batch["age2"])
+        """
+        return iter(BatchExecutor(self, batch_size=batch_size,
+                                  use_numpy=use_numpy))
+
+    def batch(self, batch_size=1000, use_numpy=False, as_dict=True):
+        """
+        Executes the chain of operations which produced this table
+        by batches of rows (see @see me iter_batches) and returns
+        a table which iterates on rows.
+
+        @param      batch_size      number of rows in a batch
+        @param      use_numpy       see @see me iter_batches
+        @param      as_dict         returns results as a list of dictionaries [ { "colname": value, ... } ]
+        @return                     IterRow
+        """
+        schema = [v.copy(None)
+                  for v in self._schema]  # we do not know the owner yet
+        names = [c.Name for c in self._schema]
+
+        def iterbatch():
+            for b in self.iter_batches(batch_size=batch_size,
+                                       use_numpy=use_numpy):
+                yield from batch_to_rows(b, names, as_dict=as_dict)
+
+        tbl = IterRow(schema, anyset=iterbatch(), as_dict=as_dict)
+        for c in schema:
+            c.set_owner(tbl)
+        tbl._plan = dict(op="batch", inputs=(self,), schema=schema,
+                         batch_size=batch_size, use_numpy=use_numpy)
         return tbl
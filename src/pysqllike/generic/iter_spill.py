@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+@file
+@brief Helpers to store intermediate results on disk when they do not fit in memory.
+"""
+import heapq
+import pickle
+import sys
+import tempfile
+
+
+def estimate_size(obj):
+    """
+    Estimates the memory used by an object, it only looks into
+    tuples, lists and dictionaries (one level).
+
+    @param      obj     any object
+    @return             size in bytes
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (tuple, list)):
+        for o in obj:
+            size += sys.getsizeof(o)
+            if isinstance(o, (tuple, list)):
+                size += sum(map(sys.getsizeof, o))
+    elif isinstance(obj, dict):
+        for k, v in obj.items():
+            size += sys.getsizeof(k) + sys.getsizeof(v)
+    return size
+
+
+class SpillFile:
+
+    """
+    Stores a sequence of objects in a temporary file with :epkg:`pickle`,
+    objects are written by chunks. The file is removed when it is closed.
+
+    ::
+
+        sp = SpillFile()
+        sp.extend([(1, "a"), (2, "b")])
+        print(list(sp))
+        sp.close()
+    """
+
+    def __init__(self, directory=None, chunk_size=1000):
+        """
+        constructor
+
+        @param      directory       directory for the temporary file (None for the default one)
+        @param      chunk_size      number of objects pickled at once
+        """
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self._chunk_size = chunk_size
+        self._buffer = []
+        self._count = 0
+
+    def __len__(self):
+        """
+        returns the number of stored objects
+        """
+        return self._count
+
+    def append(self, obj):
+        """
+        adds an object
+
+        @param      obj     any object :epkg:`pickle` can serialize
+        """
+        self._buffer.append(obj)
+        self._count += 1
+        if len(self._buffer) >= self._chunk_size:
+            self._flush()
+
+    def extend(self, objs):
+        """
+        adds a sequence of objects
+
+        @param      objs    iterator on objects
+        """
+        for obj in objs:
+            self.append(obj)
+
+    def _flush(self):
+        """
+        writes the buffer into the file
+        """
+        if self._buffer:
+            pickle.dump(self._buffer, self._file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+            self._buffer = []
+
+    def __iter__(self):
+        """
+        iterates on the stored objects in the order they were added,
+        the file must not be modified while it is read
+        """
+        self._flush()
+        self._file.seek(0)
+        while True:
+            try:
+                chunk = pickle.load(self._file)
+            except EOFError:
+                break
+            yield from chunk
+
+    def close(self):
+        """
+        removes the file
+        """
+        self._buffer = []
+        self._file.close()
+
+
+def external_sort(items, key, reverse=False, memory_limit=None, directory=None):
+    """
+    Sorts a sequence of objects, sorted runs are stored in temporary files
+    (see @see cl SpillFile) every time the estimated size of the objects
+    held in memory exceeds *memory_limit*, the runs are merged with
+    :epkg:`heapq` (k-way merge). The sort is stable.
+
+    @param      items           iterator on objects
+    @param      key             function which returns the sorting key of an object
+    @param      reverse         descending order
+    @param      memory_limit    memory budget in bytes (None for no limit)
+    @param      directory       directory for the temporary files
+    @return                     iterator on sorted objects
+    """
+    buffer = []
+    size = 0
+    runs = []
+    try:
+        for item in items:
+            buffer.append(item)
+            if memory_limit is not None:
+                size += estimate_size(item)
+                if size > memory_limit:
+                    buffer.sort(key=key, reverse=reverse)
+                    run = SpillFile(directory)
+                    runs.append(run)
+                    run.extend(buffer)
+                    buffer = []
+                    size = 0
+        buffer.sort(key=key, reverse=reverse)
+        if not runs:
+            yield from buffer
+            return
+        iters = [iter(r) for r in runs] + [buffer]
+        yield from heapq.merge(*iters, key=key, reverse=reverse)
+    finally:
+        for run in runs:
+            run.close()
+
+
+def external_distinct(items, key=None, memory_limit=None, partitions=16,
+                      directory=None, max_depth=3, _depth=0):
+    """
+    Returns the first occurrence of every key, the keys already seen
+    are stored in a set. If the estimated size of the set exceeds *memory_limit*,
+    the set stops growing: the objects whose key is not in the set
+    are stored in *partitions* temporary files (see @see cl SpillFile)
+    based on the hash of the key, every file is then processed the same way
+    once the set is released.
+
+    @param      items           iterator on objects
+    @param      key             function which returns the key of an object (None for the object itself),
+                                it must be hashable
+    @param      memory_limit    memory budget in bytes for the set (None for no limit)
+    @param      partitions      number of partitions
+    @param      directory       directory for the temporary files
+    @param      max_depth       a partition is not split more than *max_depth* times
+    @return                     iterator on objects
+
+    The order of the first occurrences is kept as long as nothing
+    is stored on disk.
+    """
+    seen = set()
+    size = 0
+    items = iter(items)
+    for item in items:
+        k = item if key is None else key(item)
+        if k in seen:
+            continue
+        seen.add(k)
+        yield item
+        if memory_limit is not None and _depth < max_depth:
+            size += estimate_size(k)
+            if size > memory_limit:
+                break
+    else:
+        return
+
+    parts = []
+    try:
+        for i in range(partitions):
+            parts.append(SpillFile(directory))
+        for item in items:
+            k = item if key is None else key(item)
+            if k not in seen:
+                parts[hash((_depth, k)) % partitions].append(item)
+        seen = None
+        for part in parts:
+            if len(part) > 0:
+                yield from external_distinct(part, key=key, memory_limit=memory_limit,
+                                             partitions=partitions, directory=directory,
+                                             max_depth=max_depth, _depth=_depth + 1)
+    finally:
+        for part in parts:
+            part.close()
+
+
+def external_aggregate(items, key, init, update, merge, memory_limit=None, partitions=16,
+                       directory=None, max_depth=3):
+    """
+    Aggregates objects by key in a hash table. If the estimated size
+    of the hash table exceeds *memory_limit*, the partial aggregations
+    and the objects not read yet are stored in *partitions* temporary files
+    (see @see cl SpillFile) based on the hash of the key, every file is then
+    aggregated the same way, the partial aggregations first (grace hash aggregation).
+
+    @param      items           iterator on objects
+    @param      key             function which returns the key of an object, it must be hashable
+    @param      init            function ``init(obj)`` which returns the aggregation of a new key
+    @param      update          function ``update(agg, obj)`` which adds an object to an aggregation
+                                (the aggregation is modified inplace)
+    @param      merge           function ``merge(agg, other)`` which returns the merged aggregation,
+                                *agg* aggregates objects read before the objects *other* aggregates
+    @param      memory_limit    memory budget in bytes for the hash table (None for no limit),
+                                the size of a group is estimated when it is created,
+                                the whole table is measured again from time to time
+                                for aggregations which grow
+    @param      partitions      number of partitions
+    @param      directory       directory for the temporary files
+    @param      max_depth       a partition is not split more than *max_depth* times
+    @return                     iterator on ``(key, aggregation)``
+
+    The aggregations must be serializable with :epkg:`pickle`.
+    The order of the groups is the order of their first object
+    as long as nothing is stored on disk.
+    """
+    entries = ((key(item), item, False) for item in items)
+    return _external_aggregate(entries, init, update, merge, memory_limit,
+                               partitions, directory, max_depth, 0)
+
+
+def _external_aggregate(entries, init, update, merge, memory_limit, partitions,
+                        directory, max_depth, depth):
+    """
+    See @see fn external_aggregate, *entries* is an iterator on
+    ``(key, object or aggregation, is an aggregation)``.
+    """
+    entries = iter(entries)
+    groups = {}
+    size = 0
+    overflow = False
+    check = memory_limit is not None and depth < max_depth
+    # number of updates since the hash table was measured
+    updates = 0
+    for k, payload, is_agg in entries:
+        grp = groups.get(k)
+        if grp is None:
+            groups[k] = payload if is_agg else init(payload)
+            if check:
+                size += estimate_size(k) + estimate_size(payload)
+                if size > memory_limit:
+                    overflow = True
+                    break
+            continue
+        if is_agg:
+            groups[k] = merge(grp, payload)
+        else:
+            update(grp, payload)
+        if check:
+            # an aggregation may grow (a list, a set of distinct values),
+            # the whole table is measured again after as many updates as groups
+            updates += 1
+            if updates >= max(len(groups), 1000):
+                updates = 0
+                size = sum(estimate_size(gk) + estimate_size(g)
+                           for gk, g in groups.items())
+                if size > memory_limit:
+                    overflow = True
+                    break
+    if not overflow:
+        yield from groups.items()
+        return
+
+    parts = []
+    try:
+        for i in range(partitions):
+            parts.append(SpillFile(directory))
+        for k, grp in groups.items():
+            parts[hash((depth, k)) % partitions].append((k, grp, True))
+        groups = None
+        for entry in entries:
+            parts[hash((depth, entry[0])) % partitions].append(entry)
+        for part in parts:
+            if len(part) > 0:
+                yield from _external_aggregate(part, init, update, merge, memory_limit,
+                                               partitions, directory, max_depth, depth + 1)
+    finally:
+        for part in parts:
+            part.close()
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+@file
+@brief Fuses a chain of operations on @see cl IterRow into a single Python loop.
+"""
+import re
+from operator import itemgetter
+from .iter_exceptions import IterException
+from .column_type import ColumnGroupType
+from .column_compiler import ExpressionCompiler
+from .others_types import NA
+
+
+class PipelineCompiler:
+
+    """
+    Reads the operations stored in @see me Plan of every
+    @see cl IterRow and generates one Python generator for the whole chain.
+    Every operator produces rows as local variables and
+    gives them to the next one (the consumer), rows are not converted
+    into dictionaries between two operators.
+    A table built by an operator the compiler does not support
+    is read through its own iterator (interpreted engine).
+
+    ::
+
+        tbl = IterRow(None, [{"nom": "j", "age": 10}])
+        iter = tbl.select(tbl.nom, age2=tbl.age * 2)
+        wher = iter.where(iter.age2 > 5)
+        comp = PipelineCompiler(wher)
+        fct = comp.compile()
+        print(comp.Source)
+        rows = list(fct())
+    """
+
+    _supported = {"select", "where", "orderby", "groupby", "unionall"}
+
+    def __init__(self, node):
+        """
+        constructor
+
+        @param      node        @see cl IterRow, the last table of the chain
+        """
+        self._node = node
+        self._comp = ExpressionCompiler()
+        self._source = None
+
+    @property
+    def Source(self):
+        """
+        returns the generated code (available after @see me compile)
+        """
+        return self._source
+
+    def compile(self):
+        """
+        Generates and compiles the code.
+
+        @return     function, a generator without parameter
+        """
+        node = self._node
+        names = [c.Name for c in node.Schema]
+
+        def consume(env, ind):
+            pad = "    " * ind
+            if node._as_dict:
+                items = ["{0}: {1}".format(repr(n), v)
+                         for n, v in zip(names, env)]
+                return [pad + "yield {{{0}}}".format(", ".join(items))]
+            else:
+                return [pad + "yield ({0},)".format(", ".join(env))]
+
+        lines = self._produce(node, consume, 1)
+        code = "\n".join(["def _pipeline_():"] + lines)
+        self._source = code
+        return self._comp.compile("_pipeline_", code)
+
+    def _var(self, prefix="_v"):
+        """
+        returns a new variable name (see @see cl ExpressionCompiler)
+        """
+        return self._comp.new_name(prefix)
+
+    @staticmethod
+    def _inputs(node, env):
+        """
+        maps every column of a table to the variable which holds its value
+        """
+        return {id(c): v for c, v in zip(node.Schema, env)}
+
+    def _expression(self, column, inputs):
+        """
+        returns the code of an expression
+        """
+        return self._comp.expression(column, inputs)
+
+    def _assign(self, exp, pad, lines):
+        """
+        stores an expression into a new variable unless it is already one
+        """
+        if re.match("^_v[0-9]+$", exp):
+            return exp
+        var = self._var()
+        lines.append(pad + "{0} = {1}".format(var, exp))
+        return var
+
+    def _can_compile(self, node):
+        """
+        checks the compiler knows every expression used by the operator
+        """
+        plan = node.Plan
+        if plan is None or plan["op"] not in PipelineCompiler._supported:
+            return False
+        if plan.get("memory_limit") is not None or plan.get("limit") is not None:
+            # the generated code sorts everything in memory
+            return False
+        if plan.get("having") is not None or plan.get("n_jobs") is not None:
+            return False
+        comp = ExpressionCompiler()
+        child = plan["inputs"][0]
+        inputs = {id(c): "_x" for c in child.Schema}
+        if plan["op"] == "select":
+            for col in plan["schema"]:
+                comp.expression(col, inputs)
+        elif plan["op"] == "where":
+            comp.expression(plan["condition"], inputs)
+        elif plan["op"] == "groupby":
+            for col in plan["schema"]:
+                if isinstance(col, ColumnGroupType):
+                    comp.expression(col.Parent[0], inputs)
+                else:
+                    comp.expression(col, inputs)
+        return len(comp.Fallbacks) == 0
+
+    def _produce(self, node, consume, ind):
+        """
+        Produces the code which iterates on the rows of a table.
+
+        @param      node        @see cl IterRow
+        @param      consume     function ``consume(env, ind)`` which returns the code
+                                processing one row, *env* is the list of variables
+                                holding the values of every column of *node*
+        @param      ind         indentation level
+        @return                 list of strings (code)
+        """
+        if not self._can_compile(node):
+            return self._produce_source(node, consume, ind)
+        plan = node.Plan
+        meth = getattr(self, "_produce_" + plan["op"])
+        return meth(node, plan, consume, ind)
+
+    def _produce_source(self, node, consume, ind):
+        """
+        iterates on the rows of a table with the interpreted engine
+        """
+        if node._thisset is None:
+            raise IterException("this class contains no iterator")
+        pad = "    " * ind
+        src = self._comp.add_global(node._thisset, "_src")
+        row = self._var("_r")
+        env = [self._var() for c in node.Schema]
+        lines = [pad + "for {0} in {1}:".format(row, src),
+                 pad + "    if isinstance({0}, dict):".format(row)]
+        lines.extend(pad + "        {0} = {1}[{2}]".format(v, row, repr(c.Name))
+                     for c, v in zip(node.Schema, env))
+        lines.append(pad + "    else:")
+        lines.extend(pad + "        {0} = {1}[{2}]".format(v, row, i)
+                     for i, v in enumerate(env))
+        lines.extend(consume(env, ind + 1))
+        return lines
+
+    def _produce_select(self, node, plan, consume, ind):
+        """
+        code for a select
+        """
+        child = plan["inputs"][0]
+
+        def cons(env, ind2):
+            pad = "    " * ind2
+            inputs = self._inputs(child, env)
+            lines = []
+            out = [self._assign(self._expression(col, inputs), pad, lines)
+                   for col in plan["schema"]]
+            lines.extend(consume(out, ind2))
+            return lines
+
+        return self._produce(child, cons, ind)
+
+    def _produce_where(self, node, plan, consume, ind):
+        """
+        code for a where
+        """
+        child = plan["inputs"][0]
+
+        def cons(env, ind2):
+            pad = "    " * ind2
+            inputs = self._inputs(child, env)
+            lines = []
+            cond = self._assign(self._expression(
+                plan["condition"], inputs), pad, lines)
+            lines.append(pad + "if {0}:".format(cond))
+            out = list(env)
+            if plan["append_condition"]:
+                out.append(cond)
+            lines.extend(consume(out, ind2 + 1))
+            return lines
+
+        return self._produce(child, cons, ind)
+
+    def _produce_orderby(self, node, plan, consume, ind):
+        """
+        code for an orderby, rows are stored in a list and sorted
+        """
+        child = plan["inputs"][0]
+        names = [c.Name for c in child.Schema]
+        pos = [names.index(k) for k in plan["keys"]]
+        pad = "    " * ind
+        lst = self._var("_l")
+
+        def cons(env, ind2):
+            key = ", ".join(env[i] for i in pos)
+            return ["    " * ind2 + "{0}.append((({1},), ({2},)))".format(
+                lst, key, ", ".join(env))]
+
+        lines = [pad + "{0} = []".format(lst)]
+        lines.extend(self._produce(child, cons, ind))
+        getter = self._comp.add_global(itemgetter(0), "_get")
+        lines.append(pad + "{0}.sort(key={1}, reverse={2})".format(
+            lst, getter, not plan["ascending"]))
+        env = [self._var() for c in node.Schema]
+        lines.append(pad + "for {0}, ({1},) in {2}:".format(
+            self._var("_k"), ", ".join(env), lst))
+        lines.extend(consume(env, ind + 1))
+        return lines
+
+    def _produce_groupby(self, node, plan, consume, ind):
+        """
+        code for a groupby, rows are aggregated in a dictionary,
+        every aggregated column updates an accumulator
+        """
+        child = plan["inputs"][0]
+        names = [c.Name for c in child.Schema]
+        pos = [names.index(k) for k in plan["keys"]]
+        schema = plan["schema"]
+        aggs = [i for i, c in enumerate(schema)
+                if isinstance(c, ColumnGroupType)]
+        firsts = [i for i, c in enumerate(schema)
+                  if not isinstance(c, ColumnGroupType)]
+        pad = "    " * ind
+        dic = self._var("_d")
+
+        def cons(env, ind2):
+            pad2 = "    " * ind2
+            inputs = self._inputs(child, env)
+            key = self._var("_k")
+            grp = self._var("_g")
+            lines = [pad2 + "{0} = ({1},)".format(key, ", ".join(env[i] for i in pos)),
+                     pad2 + "{0} = {1}.get({2})".format(grp, dic, key),
+                     pad2 + "if {0} is None:".format(grp)]
+            first = [self._expression(schema[i], inputs) for i in firsts]
+            inits = ["{0}()".format(self._comp.add_global(schema[i]._opgr.init, "_init"))
+                     for i in aggs]
+            lines.append(pad2 + "    {0} = {1}[{2}] = [({3}{4}), {5}]".format(
+                grp, dic, key, ", ".join(first), "," if first else "", ", ".join(inits)))
+            shared = {}
+            for j, i in enumerate(aggs):
+                exp = self._expression(schema[i].Parent[0], inputs)
+                if exp not in shared:
+                    # an expression received by several aggregated columns
+                    # is evaluated once
+                    shared[exp] = self._assign(exp, pad2, lines)
+                upd = self._comp.add_global(schema[i]._opgr.update, "_upd")
+                lines.append(pad2 + "{0}[{1}] = {2}({0}[{1}], {3})".format(
+                    grp, j + 1, upd, shared[exp]))
+            return lines
+
+        lines = [pad + "{0} = {{}}".format(dic)]
+        lines.extend(self._produce(child, cons, ind))
+        key = self._var("_k")
+        grp = self._var("_g")
+        if plan["sort_keys"]:
+            lines.append(pad + "for {0} in sorted({1}):".format(key, dic))
+        else:
+            lines.append(pad + "for {0} in {1}:".format(key, dic))
+        lines.append(pad + "    {0} = {1}[{2}]".format(grp, dic, key))
+        env = [self._var() for c in schema]
+        if firsts:
+            lines.append(pad + "    {0}, = {1}[0]".format(
+                ", ".join(env[i] for i in firsts), grp))
+        for j, i in enumerate(aggs):
+            fin = self._comp.add_global(schema[i]._opgr.finalize, "_fin")
+            lines.append(pad + "    {0} = {1}({2}[{3}])".format(
+                env[i], fin, grp, j + 1))
+        lines.extend(consume(env, ind + 1))
+        return lines
+
+    def _produce_unionall(self, node, plan, consume, ind):
+        """
+        code for an unionall, the consumer is called once for every table
+        """
+        na = self._comp.add_global(NA(), "_na")
+        lines = []
+        for child in plan["inputs"]:
+            names = [c.Name for c in child.Schema]
+
+            def cons(env, ind2, names=names):
+                values = dict(zip(names, env))
+                out = [values.get(c.Name, na) for c in node.Schema]
+                return consume(out, ind2)
+
+            lines.extend(self._produce(child, cons, ind))
+        return lines